@@ -0,0 +1,241 @@
+# Persistent cache of processed articles.
+
+# Articles are stored in SQLite, keyed by their canonical URL, with a
+# second index from normalized headline titles to URLs. A headline we've
+# already seen (under any of its titles or links) gets its link, article
+# text and summary from here instead of being searched, scraped and
+# summarized again. Entries expire after a TTL, and the least recently
+# used ones are evicted once the cache is over its size limit.
+
+import re
+import sqlite3
+import threading
+import time
+
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+CACHE_PATH = "./data/article_cache.sqlite"
+CACHE_TTL = 2 * 24 * 60 * 60  # Seconds an article is kept
+CACHE_MAX_ENTRIES = 2000
+
+# Query params that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "ocid", "cmpid", "smid", "ref", "taid"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonicalizes a URL so the same article gets the same key no
+    matter how it was linked (scheme, www., tracking params, etc.).
+
+    Args:
+        url (str): URL to canonicalize
+
+    Returns:
+        str: Canonical URL
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse(("https", host, path, "", urlencode(sorted(query)), ""))
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalizes a headline title for matching (case, punctuation
+    and whitespace are ignored).
+
+    Args:
+        title (str): Headline title
+
+    Returns:
+        str: Normalized title
+    """
+    title = re.sub(r"[^\w\s]", " ", title.lower())
+    return " ".join(title.split())
+
+
+class ArticleCache:
+    """
+    SQLite store of scraped and summarized articles.
+
+    Safe to share between the event loop and executor threads; every
+    query is short, so it's called directly without an executor.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: float = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    link TEXT,
+                    body TEXT,
+                    tier TEXT,
+                    summary TEXT,
+                    created_at REAL,
+                    accessed_at REAL
+                )""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS titles (
+                    title_key TEXT PRIMARY KEY,
+                    url TEXT
+                )""")
+        self.evict()
+        return
+
+    def _get(self, url: str) -> dict:
+        """
+        Gets an unexpired article by canonical URL, and marks it as used.
+
+        Args:
+            url (str): Canonical URL
+
+        Returns:
+            dict: Cached article, or None if it's missing or expired
+        """
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT * FROM articles WHERE url = ? AND created_at > ?",
+                (url, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE articles SET accessed_at = ? WHERE url = ?", (now, url)
+            )
+        return dict(row)
+
+    def get_by_url(self, link: str) -> dict:
+        """
+        Gets a cached article by its link.
+
+        Args:
+            link (str): Article link
+
+        Returns:
+            dict: Cached article (link, body, tier, summary), or None
+        """
+        return self._get(canonicalize_url(link))
+
+    def get_by_title(self, title: str) -> dict:
+        """
+        Gets a cached article by the title of a headline that linked to it.
+
+        Args:
+            title (str): Headline title
+
+        Returns:
+            dict: Cached article (link, body, tier, summary), or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url FROM titles WHERE title_key = ?",
+                (normalize_title(title),),
+            ).fetchone()
+        if row is None:
+            return None
+        return self._get(row["url"])
+
+    def put(self, title: str, link: str, body: str, tier: str) -> None:
+        """
+        Stores a scraped article, and indexes it under the headline title.
+
+        Args:
+            title (str): Headline title
+            link (str): Article link
+            body (str): Extracted article text
+            tier (str): Tier that served the article
+        """
+        url = canonicalize_url(link)
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                """INSERT INTO articles VALUES (?, ?, ?, ?, NULL, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    link = excluded.link, body = excluded.body,
+                    tier = excluded.tier, summary = NULL,
+                    created_at = excluded.created_at,
+                    accessed_at = excluded.accessed_at""",
+                (url, link, body, tier, now, now),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO titles VALUES (?, ?)",
+                (normalize_title(title), url),
+            )
+        self.evict()
+        return
+
+    def add_title(self, title: str, link: str) -> None:
+        """
+        Indexes an already cached article under another headline title.
+
+        Args:
+            title (str): Headline title
+            link (str): Article link
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO titles VALUES (?, ?)",
+                (normalize_title(title), canonicalize_url(link)),
+            )
+        return
+
+    def set_summary(self, link: str, summary: str) -> None:
+        """
+        Stores the summary of a cached article.
+
+        Args:
+            link (str): Article link
+            summary (str): Article summary
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE articles SET summary = ? WHERE url = ?",
+                (summary, canonicalize_url(link)),
+            )
+        return
+
+    def evict(self) -> None:
+        """
+        Removes expired articles, then the least recently used ones
+        until the cache is within its size limit.
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM articles WHERE created_at <= ?",
+                (time.time() - self.ttl,),
+            )
+            self._db.execute(
+                """DELETE FROM articles WHERE url IN (
+                    SELECT url FROM articles ORDER BY accessed_at DESC
+                    LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._db.execute(
+                "DELETE FROM titles WHERE url NOT IN (SELECT url FROM articles)"
+            )
+        return
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._db.close()
+        return
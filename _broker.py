@@ -0,0 +1,275 @@
+# Local socket broker between a scanning producer and Discord consumers.
+
+# In a sharded deployment one producer process scans the feeds, scrapes
+# and summarizes every story once, and publishes each scan's stories;
+# any number of lightweight consumer processes (one per shard, or per
+# set of guilds) subscribe to the feeds they post and only talk to
+# Discord. Chrome, the models, the caches and the Google News requests
+# then exist once, however many guilds are served.
+
+# The wire format is newline-delimited JSON over TCP. A consumer opens
+# with {"subscribe": [feed names] (or null for all), "since": {feed:
+# scan id}}, and then receives one message per published (or edited)
+# scan: {"feed", "scan", "heading", "stories", "edit", "created_at"}.
+# Scan ids increase over time, even across producer restarts, and the
+# producer keeps the last few scans of each feed, so a consumer that
+# reconnects gets the scans it missed. A consumer that can't keep up
+# is disconnected rather than slowing the producer down; it reconnects
+# and catches up from the history.
+
+import asyncio
+import itertools
+import json
+import time
+
+from collections import deque
+from datetime import datetime, timezone
+
+BROKER_HOST = "127.0.0.1"
+BROKER_PORT = 9109
+QUEUE_SIZE = 100  # Messages buffered per consumer before it's dropped
+HISTORY = 20  # Scans kept per feed for consumers catching up
+MAX_LINE = 16 * 1024 * 1024  # Longest message, in bytes
+RECONNECT_DELAY = 1  # Seconds before a consumer's first reconnect
+MAX_RECONNECT_DELAY = 30
+
+
+class PublishedScan:
+    """
+    A published scan, standing in for the messages a post would
+    return, so streamed edits are published under the same scan.
+    """
+
+    def __init__(self, scan: int, created_at: datetime) -> None:
+        self.scan = scan
+        self.created_at = created_at
+        return
+
+
+class _Subscriber:
+    """
+    A connected consumer and its queue of messages to send.
+    """
+
+    def __init__(
+        self, writer: asyncio.StreamWriter, feeds: set, queue_size: int = QUEUE_SIZE
+    ) -> None:
+        self.writer = writer
+        self.feeds = feeds  # None for every feed
+        self.queue = asyncio.Queue(queue_size)  # None ends the connection
+        return
+
+    def wants(self, feed: str) -> bool:
+        return self.feeds is None or feed in self.feeds
+
+
+class BrokerServer:
+    """
+    Publishes scans to every consumer subscribed to their feed.
+    """
+
+    def __init__(
+        self,
+        host: str = BROKER_HOST,
+        port: int = BROKER_PORT,
+        queue_size: int = QUEUE_SIZE,
+        history: int = HISTORY,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.history = history
+        self._server = None
+        self._subscribers = set()
+        self._history = {}  # Feed -> deque of its last messages
+        # Millisecond timestamps, so ids keep increasing across restarts
+        self._ids = itertools.count(int(time.time() * 1000))
+        return
+
+    async def start(self) -> None:
+        """
+        Starts accepting consumers. Does nothing if already started.
+        """
+        if self._server is not None:
+            return
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=MAX_LINE
+        )
+        print("Publishing news on " + self.host + ":" + str(self.port))
+        return
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serves one consumer: reads its subscription, sends it the scans
+        it missed, then everything published to its feeds.
+        """
+        peer = writer.get_extra_info("peername")
+        subscriber = None
+        try:
+            hello = json.loads(await reader.readline())
+            feeds = hello.get("subscribe")
+            subscriber = _Subscriber(
+                writer, set(feeds) if feeds is not None else None, self.queue_size
+            )
+            # Resend the last scan it got too, in case it was edited since,
+            # but only the latest version of each scan (edits replace it)
+            since = hello.get("since") or {}
+            latest = {}
+            for feed, messages in self._history.items():
+                if subscriber.wants(feed) and feed in since:
+                    for message in messages:
+                        if message["scan"] >= since[feed]:
+                            latest.pop((feed, message["scan"]), None)
+                            latest[(feed, message["scan"])] = message
+            missed = list(latest.values())
+            for message in missed[-self.queue_size :]:
+                subscriber.queue.put_nowait(message)
+            self._subscribers.add(subscriber)
+            print("News consumer connected from", peer, "for", feeds or "every feed")
+            while True:
+                message = await subscriber.queue.get()
+                if message is None:
+                    break
+                writer.write(json.dumps(message).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError) as e:
+            print("News consumer", peer, "disconnected: ", e)
+        finally:
+            self._subscribers.discard(subscriber)
+            writer.close()
+        return
+
+    def _send(self, subscriber: _Subscriber, message: dict) -> None:
+        """
+        Queues a message for a consumer, dropping the consumer if its
+        queue is full.
+        """
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            print("Dropping news consumer that fell behind.")
+            self._drop(subscriber)
+        return
+
+    def _drop(self, subscriber: _Subscriber) -> None:
+        """
+        Disconnects a consumer once it's done sending what it's on.
+        """
+        self._subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        return
+
+    async def publish(
+        self, feed: str, heading: str, stories: list, messages: list = None
+    ) -> list:
+        """
+        Publishes a scan's stories to the feed's subscribers. Same
+        interface as NewsPoster.post, with the feed instead of a channel.
+
+        Args:
+            feed (str): Name of the feed
+            heading (str): Heading of the post
+            stories (list): Stories to post
+            messages (list, optional): What an earlier call returned, to
+                publish this as an edit of that scan
+
+        Returns:
+            list: The published scan
+        """
+        if messages:
+            scan = messages[0]
+        else:
+            scan = PublishedScan(next(self._ids), datetime.now(timezone.utc))
+        message = {
+            "feed": feed,
+            "scan": scan.scan,
+            "heading": heading,
+            "stories": [list(story) for story in stories],
+            "edit": bool(messages),
+            "created_at": scan.created_at.isoformat(),
+        }
+        history = self._history.setdefault(feed, deque(maxlen=self.history))
+        history.append(message)
+        subscribers = [s for s in self._subscribers if s.wants(feed)]
+        if not subscribers:
+            print("No news consumers subscribed to " + feed + " news yet.")
+        for subscriber in subscribers:
+            self._send(subscriber, message)
+        return [scan]
+
+    async def stop(self) -> None:
+        """
+        Disconnects every consumer and stops accepting new ones.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        for subscriber in list(self._subscribers):
+            self._drop(subscriber)
+        await self._server.wait_closed()
+        self._server = None
+        return
+
+
+class BrokerClient:
+    """
+    Consumer's connection to the producer, reconnecting (and catching
+    up on missed scans) whenever it drops.
+    """
+
+    def __init__(
+        self, host: str = BROKER_HOST, port: int = BROKER_PORT, feeds: list = None
+    ) -> None:
+        """
+        Args:
+            host (str, optional): Producer's host
+            port (int, optional): Producer's port
+            feeds (list, optional): Feeds to subscribe to, or None for all
+        """
+        self.host = host
+        self.port = port
+        self.feeds = feeds
+        self._since = {}  # Feed -> id of the last scan received
+        return
+
+    async def messages(self):
+        """
+        Yields every scan published to the subscribed feeds, forever.
+
+        Yields:
+            dict: Published scan (feed, scan, heading, stories, edit, created_at)
+        """
+        delay = RECONNECT_DELAY
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(
+                    self.host, self.port, limit=MAX_LINE
+                )
+                # Catch up only on feeds we've already heard from, so a
+                # fresh consumer doesn't repost old scans
+                hello = {"subscribe": self.feeds, "since": self._since}
+                writer.write(json.dumps(hello).encode("utf-8") + b"\n")
+                await writer.drain()
+                print(
+                    "Connected to news producer at " + self.host + ":" + str(self.port)
+                )
+                delay = RECONNECT_DELAY
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        raise ConnectionError("producer closed the connection")
+                    message = json.loads(line)
+                    self._since[message["feed"]] = message["scan"]
+                    yield message
+            except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+                print("Err receiving news from producer: ", e)
+            finally:
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
@@ -0,0 +1,193 @@
+# Pool of reusable headless Chrome instances.
+
+# Drivers are created lazily (up to the pool size) and leased out one
+# page at a time. A driver is recycled (quit and replaced on the next
+# lease) once it has loaded too many pages, its process tree uses too
+# much memory, or it fails a health check after an error, so a long
+# running bot keeps bounded memory and one hung page can't block every
+# later scan.
+
+import asyncio
+import contextlib
+import functools
+import os
+
+POOL_SIZE = 2  # Max number of Chrome instances alive at once
+MAX_PAGES_PER_DRIVER = 50  # Recycle a driver after this many page loads
+MAX_DRIVER_RSS_MB = 1024  # Recycle a driver once its processes use this much
+PAGE_LOAD_TIMEOUT = 20  # Seconds before a page load is abandoned
+
+
+def _process_tree_rss_mb(pid: int) -> float:
+    """
+    Sums the resident memory of a process and all its descendants
+    (chromedriver spawns Chrome, which spawns its renderers).
+
+    Only works where /proc is available (Linux); returns 0 elsewhere,
+    which disables memory-based recycling.
+
+    Args:
+        pid (int): Root process ID
+
+    Returns:
+        float: Total RSS in megabytes
+    """
+    if not os.path.isdir("/proc"):
+        return 0
+    children = {}
+    rss_pages = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open("/proc/" + entry + "/stat", "r") as file:
+                stat = file.read()
+            with open("/proc/" + entry + "/statm", "r") as file:
+                statm = file.read()
+        except OSError:
+            continue
+        # The process name can contain spaces, so split after it
+        fields = stat[stat.rindex(")") + 2 :].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss_pages[int(entry)] = int(statm.split()[1])
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss_pages.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class BrowserPool:
+    """
+    Pool of warm Selenium drivers, leased per article.
+
+    All blocking driver calls (creating, health checking, quitting) are
+    run on the given executor, so the pool can be used from the event loop.
+    """
+
+    def __init__(
+        self,
+        make_driver,
+        executor,
+        size: int = POOL_SIZE,
+        max_pages: int = MAX_PAGES_PER_DRIVER,
+        max_rss_mb: float = MAX_DRIVER_RSS_MB,
+        page_load_timeout: float = PAGE_LOAD_TIMEOUT,
+    ) -> None:
+        self.make_driver = make_driver
+        self.executor = executor
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.page_load_timeout = page_load_timeout
+        self._slots = asyncio.Semaphore(size)
+        self._idle = []
+        self._pages = {}  # Driver -> number of pages it has loaded
+        self._closed = False
+        return
+
+    async def _run(self, func, *args):
+        """
+        Runs a blocking driver call on the pool's executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def _new_driver(self):
+        """
+        Creates a driver with the pool's page load timeout.
+        """
+        driver = self.make_driver()
+        driver.set_page_load_timeout(self.page_load_timeout)
+        return driver
+
+    def _is_healthy(self, driver) -> bool:
+        """
+        Checks that a driver still responds to commands.
+        """
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _needs_recycle(self, driver) -> bool:
+        """
+        Checks if a driver has loaded too many pages or uses too much memory.
+        """
+        if self._pages.get(driver, 0) >= self.max_pages:
+            return True
+        if self.max_rss_mb:
+            try:
+                rss = _process_tree_rss_mb(driver.service.process.pid)
+            except Exception:
+                rss = 0
+            if rss >= self.max_rss_mb:
+                print("Recycling Chrome using", round(rss), "MB.")
+                return True
+        return False
+
+    def _quit(self, driver) -> None:
+        """
+        Quits a driver, ignoring errors from drivers that already died.
+        """
+        try:
+            driver.quit()
+        except Exception as e:
+            print("Err quitting Chrome driver: ", e)
+        return
+
+    async def _discard(self, driver) -> None:
+        """
+        Removes a driver from the pool and quits it.
+        """
+        self._pages.pop(driver, None)
+        await self._run(self._quit, driver)
+        return
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        """
+        Leases a driver for loading one page. Waits if every driver
+        is in use, and creates a new one if the pool isn't full yet.
+
+        Yields:
+            webdriver.Chrome: Driver to use until the context exits
+        """
+        if self._closed:
+            raise RuntimeError("Browser pool is closed")
+        async with self._slots:
+            if self._idle:
+                driver = self._idle.pop()
+            else:
+                driver = await self._run(self._new_driver)
+                self._pages[driver] = 0
+            healthy = True
+            try:
+                yield driver
+            except Exception:
+                # Timeouts and crashes can leave the driver stuck on a page
+                healthy = await self._run(self._is_healthy, driver)
+                raise
+            finally:
+                self._pages[driver] = self._pages.get(driver, 0) + 1
+                recycle = not healthy or self._closed
+                if not recycle:
+                    recycle = await self._run(self._needs_recycle, driver)
+                if recycle:
+                    await self._discard(driver)
+                else:
+                    self._idle.append(driver)
+
+    async def close(self) -> None:
+        """
+        Quits all idle drivers. Drivers still leased are quit when
+        they're returned.
+        """
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for driver in idle:
+            await self._discard(driver)
+        return
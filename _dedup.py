@@ -0,0 +1,130 @@
+# Near-duplicate clustering of headlines across feeds.
+
+# The US and world feeds (and different outlets within a feed) often
+# carry the same event under slightly different titles. Headlines are
+# turned into sets of word shingles, and a headline joins an existing
+# cluster when its Jaccard similarity to any headline in the cluster is
+# over a threshold. Clusters only live for a time window, so the same
+# wording about a new event later on starts a new cluster.
+
+import time
+
+from _article_cache import normalize_title
+
+DEDUP_WINDOW = 6 * 60 * 60  # Seconds a cluster accepts new headlines
+DEDUP_THRESHOLD = 0.5  # Min Jaccard similarity to join a cluster
+
+STOPWORDS = set("""a an and are as at be by for from has have in is it its of on or over
+    says say that the to was were will with after new""".split())
+
+
+def headline_shingles(title: str) -> set:
+    """
+    Turns a headline into shingles: its content words and pairs of
+    adjacent content words.
+
+    Args:
+        title (str): Headline title
+
+    Returns:
+        set: Shingles of the headline
+    """
+    words = [w for w in normalize_title(title).split() if w not in STOPWORDS]
+    shingles = set(words)
+    shingles.update(a + " " + b for a, b in zip(words, words[1:]))
+    return shingles
+
+
+def jaccard(a: set, b: set) -> float:
+    """
+    Jaccard similarity of two sets.
+
+    Args:
+        a (set): First set
+        b (set): Second set
+
+    Returns:
+        float: Similarity from 0 to 1
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class StoryClusterer:
+    """
+    Clusters near-duplicate headlines seen within a time window. An
+    inverted index from shingles to clusters keeps lookups cheap as
+    the number of feeds grows.
+    """
+
+    def __init__(
+        self, window: float = DEDUP_WINDOW, threshold: float = DEDUP_THRESHOLD
+    ) -> None:
+        self.window = window
+        self.threshold = threshold
+        self._next_id = 0
+        self._clusters = {}  # Cluster id -> (created time, [shingle sets])
+        self._index = {}  # Shingle -> cluster ids containing it
+        return
+
+    def _expire(self) -> None:
+        """
+        Drops clusters older than the window.
+        """
+        cutoff = time.time() - self.window
+        expired = [
+            cid for cid, (created, _) in self._clusters.items() if created < cutoff
+        ]
+        for cid in expired:
+            _, members = self._clusters.pop(cid)
+            for shingles in members:
+                for shingle in shingles:
+                    ids = self._index.get(shingle)
+                    if ids is not None:
+                        ids.discard(cid)
+                        if not ids:
+                            del self._index[shingle]
+        return
+
+    def is_active(self, cluster_id: int) -> bool:
+        """
+        Checks if a cluster is still within the window.
+
+        Args:
+            cluster_id (int): Cluster id
+
+        Returns:
+            bool: True if the cluster hasn't expired
+        """
+        return cluster_id in self._clusters
+
+    def assign(self, title: str) -> int:
+        """
+        Assigns a headline to the cluster of its closest near-duplicate,
+        or to a new cluster if there isn't one.
+
+        Args:
+            title (str): Headline title
+
+        Returns:
+            int: Cluster id
+        """
+        self._expire()
+        shingles = headline_shingles(title)
+        candidates = set()
+        for shingle in shingles:
+            candidates.update(self._index.get(shingle, ()))
+        best, best_score = None, 0.0
+        for cid in candidates:
+            score = max(jaccard(shingles, other) for other in self._clusters[cid][1])
+            if score > best_score:
+                best, best_score = cid, score
+        if best is None or best_score < self.threshold:
+            best = self._next_id
+            self._next_id += 1
+            self._clusters[best] = (time.time(), [])
+        self._clusters[best][1].append(shingles)
+        for shingle in shingles:
+            self._index.setdefault(shingle, set()).add(best)
+        return best
@@ -0,0 +1,204 @@
+# Running scans without Discord.
+
+# A dry run drives the same NewsBot pipeline (fetch, resolve, scrape,
+# summarize, post) for a fixed number of scan cycles, but posts go to a
+# DryRunPoster that records them (and prints them) instead of sending
+# them to a channel. Feed pages can be replayed from saved HTML files
+# instead of fetched from Google News, so a scan can be profiled and
+# tuned on a staging box, repeatably, without a bot token or a guild.
+
+import asyncio
+import os
+import time
+
+from datetime import datetime, timezone
+
+from _feeds import FeedState
+from _fetcher import FetchResult
+from _poster import format_story
+
+
+class DryRunMessage:
+    """
+    Stands in for a Discord message, so the bot can edit and delete
+    what it "posted" like it would in a channel.
+    """
+
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self.created_at = datetime.now(timezone.utc)
+        return
+
+    async def edit(self, content: str = None, embeds: list = None):
+        self.content = content
+        return self
+
+    async def delete(self) -> None:
+        return
+
+
+class DryRunPoster:
+    """
+    Poster with the same interface as NewsPoster that records posts,
+    and optionally prints them, instead of sending them to Discord.
+    """
+
+    def __init__(self, stream=None) -> None:
+        """
+        Args:
+            stream (file, optional): Where to print each post as text, or
+                None to only record them
+        """
+        self.stream = stream
+        self.posts = []  # One record per post (or edit)
+        return
+
+    async def post(
+        self, channel_id: int, heading: str, stories: list, messages: list = None
+    ) -> list:
+        """
+        Records stories as posted to a channel.
+
+        Args:
+            channel_id (int): Channel they'd be posted to
+            heading (str): Content of the message, above the stories
+            stories (list): Stories to post
+            messages (list, optional): Messages the post would edit
+
+        Returns:
+            list: One message standing for the post
+        """
+        record = {
+            "channel_id": channel_id,
+            "heading": heading,
+            "edit": bool(messages),
+            "stories": [
+                {
+                    "date": story[0],
+                    "title": story[1],
+                    "link": story[2],
+                    "summary": story[3],
+                    "tier": story[4] if len(story) > 4 else "",
+                    "source": story[5] if len(story) > 5 else "",
+                }
+                for story in stories
+            ],
+        }
+        self.posts.append(record)
+        if self.stream is not None:
+            text = heading + "\n" + "".join(format_story(s) for s in stories)
+            print(text, file=self.stream, flush=True)
+        if messages:
+            return [await messages[0].edit(content=heading)]
+        return [DryRunMessage(heading)]
+
+
+class ReplayFetcher:
+    """
+    Wraps a Fetcher to serve some URLs (feed pages) from saved HTML
+    instead of the network; everything else goes to the wrapped fetcher.
+    """
+
+    def __init__(self, fetcher, pages: dict) -> None:
+        """
+        Args:
+            fetcher (Fetcher): Fetcher for everything that isn't replayed
+            pages (dict): URL -> HTML to serve for it
+        """
+        self.fetcher = fetcher
+        self.pages = pages
+        return
+
+    async def request(self, method: str, url: str, **kwargs) -> FetchResult:
+        if method == "GET" and url in self.pages:
+            return FetchResult(200, url, {}, self.pages[url])
+        return await self.fetcher.request(method, url, **kwargs)
+
+    async def get(self, url: str, headers: dict = None) -> FetchResult:
+        return await self.request("GET", url, headers=headers)
+
+    async def close(self) -> None:
+        await self.fetcher.close()
+        return
+
+
+def load_replay(directory: str, feeds: list) -> dict:
+    """
+    Loads saved feed pages, one <feed name>.html per feed.
+
+    Args:
+        directory (str): Directory of the saved pages
+        feeds (list): Feeds to find pages for
+
+    Returns:
+        dict: Feed URL -> saved HTML, for the feeds that have a page
+    """
+    pages = {}
+    for feed in feeds:
+        path = os.path.join(directory, feed.name + ".html")
+        if not os.path.exists(path):
+            print("No saved page for " + feed.name + " news, fetching it.")
+            continue
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            pages[feed.url] = file.read()
+    return pages
+
+
+async def run_cycles(
+    bot,
+    feeds: list,
+    cycles: int = 1,
+    interval: float = 0,
+    max_concurrent_scans: int = 2,
+    rescan: bool = False,
+) -> list:
+    """
+    Scans every feed once per cycle, a few at a time, and times each scan.
+
+    Args:
+        bot (NewsBot): Bot to scan with
+        feeds (list): Feeds to scan
+        cycles (int, optional): Number of scan cycles. Defaults to 1.
+        interval (float, optional): Seconds from the start of one cycle to
+            the start of the next. Defaults to 0.
+        max_concurrent_scans (int, optional): Max scans running at once
+        rescan (bool, optional): Forget each feed's last page and posted
+            stories before every cycle after the first, so it isn't
+            skipped as unchanged. Defaults to False.
+
+    Returns:
+        list: Per cycle, its duration and each feed's scan duration,
+            number of stories posted and outcome
+    """
+    slots = asyncio.Semaphore(max_concurrent_scans)
+
+    async def scan(feed) -> dict:
+        async with slots:
+            started = time.perf_counter()
+            record = {"feed": feed.name, "stories": 0, "outcome": "ok"}
+            try:
+                results = await bot.scan_feed(feed)
+                record["stories"] = len(results or [])
+            except Exception as e:
+                print("Err scanning " + feed.name + " news: ", e)
+                record["outcome"] = "error"
+                record["error"] = repr(e)
+            record["seconds"] = round(time.perf_counter() - started, 3)
+            return record
+
+    report = []
+    for n in range(cycles):
+        if rescan and n > 0:
+            for feed in feeds:
+                bot.feed_states[feed.name] = FeedState()
+                bot.story_index.forget(feed.name)
+        started = time.perf_counter()
+        scans = await asyncio.gather(*[scan(feed) for feed in feeds])
+        seconds = time.perf_counter() - started
+        report.append({"cycle": n + 1, "seconds": round(seconds, 3), "scans": scans})
+        print(
+            "Finished cycle", n + 1, "of", cycles, "in", round(seconds, 1), "seconds."
+        )
+        if n + 1 < cycles:
+            await asyncio.sleep(max(0, interval - seconds))
+    return report
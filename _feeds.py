@@ -0,0 +1,256 @@
+# News feeds the bot scans, declared in config.json.
+
+# Each feed is a Google News page (top stories, a topic, a search...),
+# the selectors that find its headlines, dates, article links and
+# sources, the channel to post to, how many headlines to take, and how
+# often to scan it. Configs from before feeds were configurable
+# (us_news_* / world_news_* keys) are turned into the equivalent "us"
+# and "world" feeds.
+
+# Each feed also keeps what it learned from its last fetch (HTTP
+# validators and fingerprints of the page and of its headlines), so a
+# page that hasn't changed is skipped without being parsed or diffed.
+
+import hashlib
+
+FEED_LIMIT = 5  # Headlines taken from the top of the page per scan
+FEED_INTERVAL = 1800  # Seconds between scans
+# With adaptive polling, a feed's interval moves between these fractions
+# / multiples of its configured interval
+MIN_INTERVAL_FACTOR = 0.5
+MAX_INTERVAL_FACTOR = 4
+
+# The card holding each headline, and the headline, date, article link
+# and source (publisher) inside it
+DEFAULT_SELECTORS = {
+    "headline": "h4",
+    "date": "time",
+    "card": "article",
+    "link": "a[href*='./read/'], a[href*='./articles/']",
+    "source": "div.vr1PYe",
+}
+
+# The feeds the bot always had, used when config.json has no "feeds" list
+LEGACY_FEEDS = {
+    "us": {
+        "url": "https://news.google.com/topstories?hl=en-US&gl=US&ceid=US:en",
+        "selectors": {"headline": "h4.iTin5e", "date": "time.hvbAAd"},
+        "heading": "🇺🇸 📰  LATEST US NEWS STORIES  📰 🇺🇸",
+    },
+    "world": {
+        "url": "https://news.google.com/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRGx1YlY4U0FtVnVHZ0pWVXlnQVAB?hl=en-US&gl=US&ceid=US%3Aen",
+        "selectors": {"headline": "h4.gPFEn", "date": "time.hvbAAd"},
+        "heading": "🌎 📰  LATEST WORLD NEWS STORIES  📰 🌎",
+    },
+}
+
+
+class Feed:
+    """
+    A news page to scan, and where and how often to post its stories.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        channel_id: int = None,
+        selectors: dict = None,
+        limit: int = FEED_LIMIT,
+        interval: float = FEED_INTERVAL,
+        heading: str = None,
+        min_interval: float = None,
+        max_interval: float = None,
+    ) -> None:
+        self.name = name
+        self.url = url
+        self.channel_id = int(channel_id) if channel_id else None
+        self.selectors = dict(DEFAULT_SELECTORS, **(selectors or {}))
+        self.limit = limit
+        self.interval = interval
+        self.min_interval = min_interval or interval * MIN_INTERVAL_FACTOR
+        self.max_interval = max_interval or interval * MAX_INTERVAL_FACTOR
+        self.heading = heading or "📰  LATEST " + name.upper() + " NEWS STORIES  📰"
+        return
+
+    def __repr__(self) -> str:
+        return "Feed(" + repr(self.name) + ", " + repr(self.url) + ")"
+
+
+def _fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class FeedState:
+    """
+    What we know about a feed's page from its last processed fetch.
+    """
+
+    def __init__(self) -> None:
+        self.etag = None
+        self.last_modified = None
+        self.page_hash = None
+        self.headlines_hash = None
+        return
+
+    def request_headers(self) -> dict:
+        """
+        Builds the headers that make the next fetch conditional.
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since headers, if known
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def page_unchanged(self, response) -> bool:
+        """
+        Checks if a fetch returned the same page as the last one.
+
+        Args:
+            response (FetchResult): Response of the fetch
+
+        Returns:
+            bool: True on 304 Not Modified or an identical body
+        """
+        if response.status == 304:
+            return True
+        return _fingerprint(response.text) == self.page_hash
+
+    def headlines_unchanged(self, headlines: list) -> bool:
+        """
+        Checks if a page's headlines are the same as the last page's
+        (the rest of the page changes on every fetch).
+
+        Args:
+            headlines (list): Headline records parsed from the page
+
+        Returns:
+            bool: True if the headlines and their links are identical
+        """
+        return self.headlines_fingerprint(headlines) == self.headlines_hash
+
+    def headlines_fingerprint(self, headlines: list) -> str:
+        """
+        Fingerprints the titles and links of a page's headlines.
+
+        Args:
+            headlines (list): Headline records parsed from the page
+
+        Returns:
+            str: Fingerprint
+        """
+        return _fingerprint(
+            "\n".join(headline[1] + "\t" + headline[2] for headline in headlines)
+        )
+
+    def remember(self, response, headlines: list) -> None:
+        """
+        Records a fetch once its page has been fully processed, so
+        the next fetch can be compared against it. Not called when a
+        scan fails, or when any of its new stories wasn't posted, so
+        the page is scanned again (and those stories retried) next time.
+
+        Args:
+            response (FetchResult): Response of the fetch
+            headlines (list): Headline records parsed from the page
+        """
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        self.page_hash = _fingerprint(response.text)
+        self.headlines_hash = self.headlines_fingerprint(headlines)
+        return
+
+
+def load_feeds(config: dict, require_channels: bool = True) -> list:
+    """
+    Builds the feeds declared in a config, or the legacy US and
+    world feeds if it doesn't declare any.
+
+    Args:
+        config (dict): Parsed config.json
+        require_channels (bool, optional): Whether every feed needs a
+            channel_id. Producers and consumers don't post to the feeds'
+            own channels, so theirs are optional. Defaults to True.
+
+    Raises:
+        ValueError: If a feed is missing a required key, or two
+            feeds have the same name
+
+    Returns:
+        list: Feeds, in the order they were declared
+    """
+    if "feeds" in config:
+        declared = config["feeds"]
+    else:
+        declared = [
+            dict(
+                LEGACY_FEEDS[name],
+                name=name,
+                channel_id=config.get(name + "_news_channel_id"),
+                limit=config.get(name + "_news_limit", FEED_LIMIT),
+                interval=config.get(name + "_news_post_timer", FEED_INTERVAL),
+            )
+            for name in ("us", "world")
+        ]
+    feeds = []
+    names = set()
+    required = ("name", "url", "channel_id") if require_channels else ("name", "url")
+    for spec in declared:
+        for key in required:
+            if not spec.get(key):
+                raise ValueError("Feed " + repr(spec) + " is missing " + repr(key))
+        if spec["name"] in names:
+            raise ValueError("Duplicate feed name " + repr(spec["name"]))
+        names.add(spec["name"])
+        feeds.append(
+            Feed(
+                spec["name"],
+                spec["url"],
+                spec.get("channel_id"),
+                selectors=spec.get("selectors"),
+                limit=spec.get("limit", FEED_LIMIT),
+                interval=spec.get("interval", FEED_INTERVAL),
+                heading=spec.get("heading"),
+                min_interval=spec.get("min_interval"),
+                max_interval=spec.get("max_interval"),
+            )
+        )
+    return feeds
+
+
+def load_subscriptions(config: dict, feeds: list) -> dict:
+    """
+    Loads which channels a consumer posts each feed to.
+
+    Args:
+        config (dict): Parsed config.json
+        feeds (list): Feeds from the same config
+
+    Raises:
+        ValueError: If a subscription is missing its feed or channel
+
+    Returns:
+        dict: Feed name -> channel ids. Without "subscriptions" in the
+            config, each feed goes to its own channel_id, if it has one.
+    """
+    declared = config.get("subscriptions")
+    if declared is None:
+        declared = [
+            {"feed": feed.name, "channel_id": feed.channel_id}
+            for feed in feeds
+            if feed.channel_id is not None
+        ]
+    subscriptions = {}
+    for spec in declared:
+        for key in ("feed", "channel_id"):
+            if not spec.get(key):
+                raise ValueError(
+                    "Subscription " + repr(spec) + " is missing " + repr(key)
+                )
+        subscriptions.setdefault(spec["feed"], []).append(int(spec["channel_id"]))
+    return subscriptions
@@ -0,0 +1,169 @@
+# Shared async HTTP client for the news bot.
+
+# Every page the bot downloads (Google News topic pages, Google search
+# lookups, article pages) goes through one aiohttp session, so connections
+# are pooled and kept alive between requests. Resolving N headlines costs
+# about one TCP + TLS handshake per host instead of one per request.
+
+import asyncio
+import random
+
+from collections import namedtuple
+
+import aiohttp
+
+MAX_CONNECTIONS = 32  # Total open connections across all hosts
+MAX_CONNECTIONS_PER_HOST = 4  # Concurrent connections to a single host
+KEEPALIVE_TIMEOUT = 60  # Seconds an idle connection is kept open
+REQUEST_TIMEOUT = 20  # Seconds for a whole request, including retries' reads
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # Seconds; doubled on every retry, plus jitter
+MAX_BACKOFF = 10
+
+# Statuses worth retrying; anything else is returned to the caller as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+FetchResult = namedtuple("FetchResult", ["status", "url", "headers", "text"])
+
+
+class FetchError(Exception):
+    """
+    Raised when a request still fails after all retries.
+    """
+
+
+class Fetcher:
+    """
+    Pooled async HTTP client with keep-alive, per-host concurrency
+    limits, timeouts and retries with exponential backoff.
+
+    The aiohttp session is created lazily on first use, so the
+    fetcher can be built before the event loop is running.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = MAX_CONNECTIONS,
+        max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST,
+        timeout: float = REQUEST_TIMEOUT,
+        retries: int = MAX_RETRIES,
+        backoff: float = BACKOFF_BASE,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._session = None
+        return
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared session, creating it (and its connection
+        pool) on first use.
+
+        Returns:
+            aiohttp.ClientSession: Shared client session
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    def _backoff_delay(self, attempt: int, retry_after: str = None) -> float:
+        """
+        Computes how long to wait before the next attempt.
+
+        Args:
+            attempt (int): Zero-based attempt number that just failed
+            retry_after (str, optional): Retry-After header sent by the server
+
+        Returns:
+            float: Seconds to wait
+        """
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+        delay = self.backoff * (2**attempt)
+        return min(delay + random.uniform(0, self.backoff), MAX_BACKOFF)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        allow_redirects: bool = True,
+        read_body: bool = True,
+    ) -> FetchResult:
+        """
+        Makes an HTTP request, retrying on connection errors, timeouts
+        and retryable statuses.
+
+        Args:
+            method (str): HTTP method
+            url (str): URL to request
+            headers (dict, optional): Extra request headers
+            allow_redirects (bool, optional): Follow redirects. Defaults to True.
+            read_body (bool, optional): Read and decode the body. Defaults to True.
+
+        Raises:
+            FetchError: If the request fails after all retries
+
+        Returns:
+            FetchResult: Status, final URL, response headers and body text
+        """
+        session = self._get_session()
+        last_error = None
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.request(
+                    method, url, headers=headers, allow_redirects=allow_redirects
+                ) as resp:
+                    if resp.status in RETRY_STATUSES and attempt < self.retries:
+                        last_error = FetchError(
+                            "HTTP " + str(resp.status) + " for " + url
+                        )
+                        await asyncio.sleep(
+                            self._backoff_delay(
+                                attempt, resp.headers.get("Retry-After")
+                            )
+                        )
+                        continue
+                    text = ""
+                    if read_body:
+                        text = await resp.text(errors="replace")
+                    return FetchResult(resp.status, str(resp.url), resp.headers, text)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                if attempt < self.retries:
+                    await asyncio.sleep(self._backoff_delay(attempt))
+        raise FetchError("Failed to fetch " + url + ": " + repr(last_error))
+
+    async def get(self, url: str, headers: dict = None) -> FetchResult:
+        """
+        GETs a URL through the shared pool.
+
+        Args:
+            url (str): URL to fetch
+            headers (dict, optional): Extra request headers
+
+        Returns:
+            FetchResult: Status, final URL, response headers and body text
+        """
+        return await self.request("GET", url, headers=headers)
+
+    async def close(self) -> None:
+        """
+        Closes the session and all pooled connections.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        return
@@ -0,0 +1,117 @@
+# Extracting headlines from Google News pages.
+
+# Google News pages are several MB of HTML, almost all of it scripts
+# and layout. The page is parsed with lxml (no BeautifulSoup tree is
+# built), and only the card containers are searched: each card gives
+# one record with its own title, date, article link and source, so a
+# card missing its date can't shift the dates of the cards after it.
+# Cards are visited in page order and parsing stops at the feed's limit.
+
+import functools
+
+from collections import namedtuple
+from urllib.parse import urljoin
+
+import lxml.etree
+import lxml.html
+
+from lxml.cssselect import CSSSelector
+
+# Index-compatible with the [date, title, link, source] lists used
+# before, so headline[1] is still the title
+Headline = namedtuple("Headline", ["date", "title", "link", "source"])
+
+
+@functools.lru_cache(maxsize=None)
+def _selector(css: str) -> CSSSelector:
+    """
+    Compiles a CSS selector (once per distinct selector).
+
+    Args:
+        css (str): CSS selector
+
+    Returns:
+        CSSSelector: Compiled selector
+    """
+    return CSSSelector(css, translator="html")
+
+
+def _first(element, css: str):
+    """
+    Finds the first element in a subtree matching a selector.
+
+    Args:
+        element (lxml.html.HtmlElement): Root of the subtree
+        css (str): CSS selector
+
+    Returns:
+        lxml.html.HtmlElement: First match, or None
+    """
+    matches = _selector(css)(element)
+    return matches[0] if matches else None
+
+
+def _text(element) -> str:
+    """
+    Gets the whitespace-normalized text of an element.
+
+    Args:
+        element (lxml.html.HtmlElement): Element, or None
+
+    Returns:
+        str: Text of the element, or "" if there's no element
+    """
+    if element is None:
+        return ""
+    return " ".join(element.text_content().split())
+
+
+def parse_headlines(html: str, feed) -> list:
+    """
+    Parses the top headlines of a feed's page, one record per card.
+    This blocks, so it's meant to be run on the fetch executor.
+
+    Args:
+        html (str): Raw HTML of the feed's page
+        feed (Feed): Feed the page belongs to, with its selectors and limit
+
+    Returns:
+        list: Headline records (date, title, link, source) in page order,
+            up to the feed's limit; date, link and source are "" if the
+            card doesn't have them
+    """
+    if not html.strip():
+        return []
+    try:
+        root = lxml.html.document_fromstring(html)
+    except (lxml.etree.ParserError, ValueError) as e:
+        print("Err parsing " + feed.name + " news page: ", e)
+        return []
+    selectors = feed.selectors
+    # Card links ("./read/...") are relative to the page's <base>,
+    # which on Google News is the site root, not the feed's URL
+    base = _first(root, "base[href]")
+    base_url = urljoin(feed.url, base.get("href") if base is not None else "/")
+    cards = _selector(selectors["card"])(root)
+    results = []
+    for card in cards:
+        title = _text(_first(card, selectors["headline"]))
+        if not title:
+            # Ads, "full coverage" links and other cards without a story
+            continue
+        link = ""
+        a = _first(card, selectors["link"])
+        if a is not None and a.get("href"):
+            link = urljoin(base_url, a.get("href"))
+        results.append(
+            Headline(
+                _text(_first(card, selectors["date"])),
+                title,
+                link,
+                _text(_first(card, selectors["source"])),
+            )
+        )
+        if len(results) == feed.limit:
+            break
+    print(len(cards), "cards,", len(results), "headlines for " + feed.name + " news.")
+    return results
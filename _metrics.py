@@ -0,0 +1,241 @@
+# Per-stage timing of the news pipeline.
+
+# Every stage of a scan (fetching the feed page, resolving article
+# links, loading and extracting pages, summarizing, posting) records how
+# long it took, with the feed, article URL, tier / backend and outcome.
+# Timings are kept as histograms, served in the Prometheus text format
+# from a small local HTTP endpoint, and can also be appended to a JSONL
+# trace file for offline analysis. Article URLs are only in the trace,
+# since as histogram labels they'd create a series per article.
+
+import contextlib
+import json
+import threading
+import time
+
+from aiohttp import web
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LABELS = ("stage", "feed", "tier", "outcome")  # Histogram labels
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations, in the Prometheus style.
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        return
+
+    def observe(self, seconds: float) -> None:
+        """
+        Adds a duration to the histogram.
+
+        Args:
+            seconds (float): Duration
+        """
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        return
+
+
+def _escape(value: str) -> str:
+    """
+    Escapes a label value for the Prometheus text format.
+
+    Args:
+        value (str): Label value
+
+    Returns:
+        str: Value with backslashes, double quotes and newlines escaped
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Collects stage timings as histograms, and optionally as a JSONL trace.
+
+    Safe to use from the event loop and executor threads.
+    """
+
+    def __init__(self, trace_path: str = None, buckets: tuple = BUCKETS) -> None:
+        self.buckets = buckets
+        self._histograms = {}  # Label values -> Histogram
+        self._lock = threading.Lock()
+        self._trace = None
+        if trace_path:
+            self._trace = open(trace_path, "a", encoding="utf-8")
+        return
+
+    def observe(self, stage: str, seconds: float, **fields) -> None:
+        """
+        Records one timing of a stage.
+
+        Args:
+            stage (str): Name of the stage
+            seconds (float): How long it took
+            **fields: Feed, tier / backend and outcome (used as labels;
+                outcome defaults to "ok"), plus anything else worth tracing
+                (article URL, counts...)
+        """
+        fields["stage"] = stage
+        fields.setdefault("outcome", "ok")
+        key = tuple(str(fields.get(label) or "") for label in LABELS)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                self._histograms[key] = histogram
+            histogram.observe(seconds)
+            if self._trace is not None:
+                record = dict(fields, ts=time.time(), seconds=round(seconds, 4))
+                self._trace.write(json.dumps(record) + "\n")
+                self._trace.flush()
+        return
+
+    @contextlib.contextmanager
+    def timer(self, stage: str, **fields):
+        """
+        Times the body of a with block as one run of a stage.
+
+        The outcome is "ok", or "error" if the block raises, unless the
+        block sets its own; fields can be added to the yielded dict
+        before the block ends (the tier that served a page, etc.).
+
+        Args:
+            stage (str): Name of the stage
+            **fields: Feed, tier / backend, article URL...
+
+        Yields:
+            dict: Fields of the record
+        """
+        started = time.perf_counter()
+        try:
+            yield fields
+        except BaseException:
+            fields["outcome"] = "error"
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, **fields)
+
+    def render(self) -> str:
+        """
+        Renders every histogram in the Prometheus text format.
+
+        Returns:
+            str: Metrics page
+        """
+        lines = [
+            "# HELP news_stage_seconds Time spent in each stage of the news pipeline.",
+            "# TYPE news_stage_seconds histogram",
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for key, histogram in items:
+                labels = ",".join(
+                    label + '="' + _escape(value) + '"'
+                    for label, value in zip(LABELS, key)
+                )
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(
+                        "news_stage_seconds_bucket{"
+                        + labels
+                        + ',le="'
+                        + str(bound)
+                        + '"} '
+                        + str(count)
+                    )
+                lines.append(
+                    "news_stage_seconds_bucket{"
+                    + labels
+                    + ',le="+Inf"} '
+                    + str(histogram.count)
+                )
+                lines.append(
+                    "news_stage_seconds_sum{" + labels + "} " + str(histogram.sum)
+                )
+                lines.append(
+                    "news_stage_seconds_count{" + labels + "} " + str(histogram.count)
+                )
+        return "\n".join(lines) + "\n"
+
+    def totals(self) -> dict:
+        """
+        Sums up the timings of each stage, over every feed, tier and
+        outcome.
+
+        Returns:
+            dict: Stage -> runs ("count") and total time ("seconds")
+        """
+        totals = {}
+        with self._lock:
+            for key, histogram in self._histograms.items():
+                total = totals.setdefault(key[0], {"count": 0, "seconds": 0.0})
+                total["count"] += histogram.count
+                total["seconds"] += histogram.sum
+        return totals
+
+    def close(self) -> None:
+        """
+        Closes the trace file.
+        """
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+        return
+
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving the metrics at /metrics.
+    """
+
+    def __init__(
+        self, metrics: Metrics, host: str = METRICS_HOST, port: int = METRICS_PORT
+    ) -> None:
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner = None
+        return
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.metrics.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    async def start(self) -> None:
+        """
+        Starts serving. Does nothing if already started.
+        """
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print("Serving metrics on http://" + self.host + ":" + str(self.port))
+        return
+
+    async def stop(self) -> None:
+        """
+        Stops serving.
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        return
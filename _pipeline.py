@@ -0,0 +1,143 @@
+# Staged async pipeline for processing a scan's stories.
+
+# Items flow through a list of stages connected by bounded asyncio
+# queues. Every stage runs its own number of workers, so the stages
+# overlap: the first story can be summarized and posted while later
+# ones are still being fetched. A full queue blocks the stage feeding
+# it (backpressure), so a slow stage never has more than queue_size
+# items waiting on it, and nothing races ahead of what can be consumed.
+
+import asyncio
+
+QUEUE_SIZE = 8  # Max items waiting between two stages
+
+_DONE = object()  # Tells a worker there are no more items
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    The stage's function is a coroutine function called with one item
+    (or, for batched stages, a list of items) that returns the item for
+    the next stage (or a list of them). Returning None drops the item.
+    """
+
+    def __init__(self, name: str, func, workers: int = 1, batch_size: int = None):
+        """
+        Args:
+            name (str): Name of the stage (for logging)
+            func (callable): Coroutine function processing items
+            workers (int, optional): Items processed at once. Defaults to 1.
+            batch_size (int, optional): If set, func gets lists of up to this
+                many items: whatever is queued when a worker is free, so a
+                lone item is never held back waiting for a full batch
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+        return
+
+
+class Pipeline:
+    """
+    Runs items through stages connected by bounded queues.
+    """
+
+    def __init__(self, stages: list, queue_size: int = QUEUE_SIZE) -> None:
+        self.stages = stages
+        self.queue_size = queue_size
+        return
+
+    async def _next_items(self, queue: asyncio.Queue, stage: Stage) -> list:
+        """
+        Takes the next item, or batch of items, off a stage's queue.
+
+        Args:
+            queue (asyncio.Queue): Stage's input queue
+            stage (Stage): Stage taking the items
+
+        Returns:
+            list: Items to process, ending with _DONE if the stream ended
+        """
+        items = [await queue.get()]
+        while (
+            stage.batch_size
+            and items[-1] is not _DONE
+            and len(items) < stage.batch_size
+            and not queue.empty()
+        ):
+            items.append(queue.get_nowait())
+        return items
+
+    async def _work(self, k: int, queues: list, results: list) -> None:
+        """
+        Processes items for stage k until the stream ends, passing the
+        output on to the next stage (or into results, after the last).
+        """
+        stage = self.stages[k]
+        while True:
+            items = await self._next_items(queues[k], stage)
+            done = items[-1] is _DONE
+            if done:
+                items.pop()
+            if items:
+                try:
+                    if stage.batch_size:
+                        outputs = await stage.func(items)
+                    else:
+                        outputs = [await stage.func(items[0])]
+                except Exception as e:
+                    # Only this item (or batch) is lost; the rest keep flowing
+                    print("Err in " + stage.name + " stage: ", e)
+                    outputs = []
+                for output in outputs or []:
+                    if output is None:
+                        continue
+                    if k + 1 < len(self.stages):
+                        await queues[k + 1].put(output)
+                    else:
+                        results.append(output)
+            if done:
+                return
+
+    async def _run_stage(self, k: int, queues: list, results: list) -> None:
+        """
+        Runs all of stage k's workers, then ends the next stage's stream.
+        """
+        await asyncio.gather(
+            *[self._work(k, queues, results) for _ in range(self.stages[k].workers)]
+        )
+        if k + 1 < len(self.stages):
+            for _ in range(self.stages[k + 1].workers):
+                await queues[k + 1].put(_DONE)
+        return
+
+    async def _feed(self, items, queue: asyncio.Queue) -> None:
+        """
+        Puts the input items on the first stage's queue.
+        """
+        for item in items:
+            await queue.put(item)
+        for _ in range(self.stages[0].workers):
+            await queue.put(_DONE)
+        return
+
+    async def run(self, items) -> list:
+        """
+        Runs items through every stage.
+
+        Args:
+            items (iterable): Input items for the first stage
+
+        Returns:
+            list: Output of the last stage, in the order it finished
+        """
+        queues = [asyncio.Queue(self.queue_size) for _ in self.stages]
+        results = []
+        await asyncio.gather(
+            self._feed(items, queues[0]),
+            *[self._run_stage(k, queues, results) for k in range(len(self.stages))],
+        )
+        return results
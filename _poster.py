@@ -0,0 +1,252 @@
+# Posting stories to Discord within its message limits and rate limits.
+
+# Stories are packed whole into embed descriptions, in order, starting a
+# new embed when one is full and a new message when a message has 10
+# embeds or 6000 characters. Only a single story too long for an embed
+# on its own is split, on paragraph / sentence / word boundaries, so
+# markdown is never cut mid-token and no story is dropped. (Embed fields
+# are capped at 1024 characters, shorter than most summaries, so stories
+# go in descriptions.) Channels are cached, sends and edits wait on
+# per-channel and global token buckets so many feeds posting together
+# stay under Discord's limits, and earlier messages can be edited in
+# place instead of posting new ones.
+
+import asyncio
+import time
+
+import discord
+
+CONTENT_LIMIT = 2000  # Characters in a message's content
+DESCRIPTION_LIMIT = 4096  # Characters in an embed's description
+EMBEDS_PER_MESSAGE = 10
+MESSAGE_EMBED_LIMIT = 6000  # Characters across all embeds of a message
+
+# Discord allows about 5 messages per 5 seconds in a channel, and 50
+# requests per second per bot overall
+CHANNEL_RATE = 5
+CHANNEL_PERIOD = 5
+GLOBAL_RATE = 50
+GLOBAL_PERIOD = 1
+
+SEPARATOR = "--------------------------------------------------------\n"
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` calls per `period` seconds, with
+    bursts of up to `rate` calls.
+    """
+
+    def __init__(self, rate: int, period: float) -> None:
+        self.rate = rate
+        self.period = period
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        return
+
+    async def acquire(self) -> None:
+        """
+        Waits until a call is allowed, and takes its token.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.rate,
+                    self._tokens + (now - self._updated) * self.rate / self.period,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+
+def format_story(story: list) -> str:
+    """
+    Formats a story as markdown for an embed description.
+
+    Args:
+        story (list): Date, title, link, summary (and tier, source) of a story
+
+    Returns:
+        str: Formatted story
+    """
+    text = SEPARATOR
+    text += "**" + story[1] + "**" + "\n" + "*" + story[0] + "*"
+    if len(story) > 5 and story[5]:
+        text += " · " + story[5]
+    text += "\n"
+    text += story[2].replace("www.", "") + "\n\n"
+    text += story[3] + "\n"
+    return text
+
+
+def split_text(text: str, limit: int) -> list:
+    """
+    Splits text into chunks of at most limit characters, preferring to
+    split at paragraphs, then lines, sentences and words.
+
+    Args:
+        text (str): Text to split
+        limit (int): Max characters per chunk
+
+    Returns:
+        list: Chunks, in order
+    """
+    chunks = []
+    while len(text) > limit:
+        cut = -1
+        for boundary in ("\n\n", "\n", ". ", " "):
+            cut = text.rfind(boundary, 0, limit - len(boundary) + 1)
+            if cut > 0:
+                cut += len(boundary)
+                break
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:]
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def pack_stories(stories: list) -> list:
+    """
+    Packs formatted stories into messages of embeds within Discord's
+    limits, keeping their order.
+
+    Args:
+        stories (list): Stories to post
+
+    Returns:
+        list: One list of embed descriptions per message
+    """
+    pages = []
+    embeds = []
+    description = ""
+    total = 0  # Characters in the current message's embeds
+    for story in stories:
+        for chunk in split_text(format_story(story), DESCRIPTION_LIMIT):
+            if (
+                len(description) + len(chunk) <= DESCRIPTION_LIMIT
+                and total + len(chunk) <= MESSAGE_EMBED_LIMIT
+            ):
+                description += chunk
+                total += len(chunk)
+                continue
+            if description:
+                embeds.append(description)
+            if (
+                len(embeds) == EMBEDS_PER_MESSAGE
+                or total + len(chunk) > MESSAGE_EMBED_LIMIT
+            ):
+                pages.append(embeds)
+                embeds = []
+                total = 0
+            description = chunk
+            total += len(chunk)
+    if description:
+        embeds.append(description)
+    if embeds:
+        pages.append(embeds)
+    return pages
+
+
+class NewsPoster:
+    """
+    Posts (or updates) lists of stories in Discord channels.
+    """
+
+    def __init__(
+        self,
+        client: discord.Client,
+        channel_rate: int = CHANNEL_RATE,
+        channel_period: float = CHANNEL_PERIOD,
+        global_rate: int = GLOBAL_RATE,
+        global_period: float = GLOBAL_PERIOD,
+    ) -> None:
+        self.client = client
+        self.channel_rate = channel_rate
+        self.channel_period = channel_period
+        self._global_limiter = RateLimiter(global_rate, global_period)
+        self._channel_limiters = {}  # Channel id -> RateLimiter
+        self._channels = {}  # Channel id -> channel
+        return
+
+    async def get_channel(self, channel_id: int):
+        """
+        Gets a channel, from the cache or else from Discord.
+
+        Args:
+            channel_id (int): Channel id
+
+        Returns:
+            discord.abc.Messageable: Channel
+        """
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self.client.get_channel(channel_id)
+            if channel is None:
+                await self._global_limiter.acquire()
+                channel = await self.client.fetch_channel(channel_id)
+            self._channels[channel_id] = channel
+        return channel
+
+    async def _wait_turn(self, channel_id: int) -> None:
+        """
+        Waits until a request to a channel is within the rate limits.
+        """
+        limiter = self._channel_limiters.get(channel_id)
+        if limiter is None:
+            limiter = RateLimiter(self.channel_rate, self.channel_period)
+            self._channel_limiters[channel_id] = limiter
+        await limiter.acquire()
+        await self._global_limiter.acquire()
+        return
+
+    async def post(
+        self, channel_id: int, heading: str, stories: list, messages: list = None
+    ) -> list:
+        """
+        Posts stories to a channel, in as few messages as fit them.
+
+        Passing the messages returned by an earlier call edits them in
+        place: messages whose content is unchanged are left alone, more
+        messages are sent if the stories no longer fit, and messages
+        that are no longer needed are deleted.
+
+        Args:
+            channel_id (int): Channel to post to
+            heading (str): Content of the messages, above their embeds
+            stories (list): Stories to post
+            messages (list, optional): Messages to edit instead of posting anew
+
+        Returns:
+            list: Posted (or edited) messages, in order
+        """
+        pages = pack_stories(stories)
+        messages = list(messages or [])
+        posted = []
+        for n, descriptions in enumerate(pages):
+            content = heading
+            if len(pages) > 1:
+                content += " (" + str(n + 1) + "/" + str(len(pages)) + ")"
+            content = content[:CONTENT_LIMIT]
+            embeds = [discord.Embed(description=d) for d in descriptions]
+            if n < len(messages):
+                message = messages[n]
+                current = [e.description for e in message.embeds]
+                if message.content != content or current != descriptions:
+                    await self._wait_turn(channel_id)
+                    message = await message.edit(content=content, embeds=embeds)
+            else:
+                channel = await self.get_channel(channel_id)
+                await self._wait_turn(channel_id)
+                message = await channel.send(content, embeds=embeds)
+            posted.append(message)
+        for message in messages[len(pages) :]:
+            await self._wait_turn(channel_id)
+            await message.delete()
+        return posted
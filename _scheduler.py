@@ -0,0 +1,152 @@
+# Runs every feed's scan on its own interval.
+
+# Each feed gets one asyncio task that scans, sleeps until its next
+# scan is due and repeats. First scans are staggered over a short
+# spread and every wait gets a little jitter, so feeds with the same
+# interval don't all hit Google News (and the shared scrape / summarize
+# pipeline) at the same moment. A semaphore caps how many scans run at
+# once; a slow scan delays its own feed's next scan, never the others'.
+
+# With adaptive polling, a feed's interval grows while its scans find
+# nothing new and shrinks when they do, within the feed's min / max
+# interval, so quiet feeds cost less and busy ones are caught sooner.
+
+import asyncio
+import random
+import time
+
+MAX_CONCURRENT_SCANS = 2
+START_SPREAD = 60  # Seconds over which the first scans are spread
+JITTER = 0.05  # Fraction of the interval added / removed from each wait
+BACKOFF = 1.5  # Interval multiplier after a scan with no new stories
+TIGHTEN = 0.5  # Interval multiplier after a scan with new stories
+
+
+class FeedScheduler:
+    """
+    Schedules periodic scans of a list of feeds.
+    """
+
+    def __init__(
+        self,
+        scan,
+        feeds: list,
+        max_concurrent_scans: int = MAX_CONCURRENT_SCANS,
+        start_spread: float = START_SPREAD,
+        jitter: float = JITTER,
+        adaptive: bool = False,
+    ) -> None:
+        """
+        Args:
+            scan (callable): Coroutine function that scans one feed
+            feeds (list): Feeds to scan
+            max_concurrent_scans (int, optional): Max scans running at once
+            start_spread (float, optional): Seconds to spread first scans over
+            jitter (float, optional): Random fraction of the interval added
+                to / removed from each wait
+            adaptive (bool, optional): Adapt each feed's interval to how
+                often its scans find new stories; scan must return the
+                new stories (anything falsy if there were none)
+        """
+        self.scan = scan
+        self.feeds = feeds
+        self.start_spread = start_spread
+        self.jitter = jitter
+        self.adaptive = adaptive
+        self._slots = asyncio.Semaphore(max_concurrent_scans)
+        self._intervals = {feed.name: feed.interval for feed in feeds}
+        self._tasks = {}  # Feed name -> task running its loop
+        return
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def get_interval(self, name: str) -> float:
+        """
+        Gets the current scan interval of a feed.
+
+        Args:
+            name (str): Name of the feed
+
+        Returns:
+            float: Seconds between scans
+        """
+        return self._intervals[name]
+
+    def set_interval(self, name: str, seconds: float) -> None:
+        """
+        Changes how often a feed is scanned, starting from its next wait.
+
+        Args:
+            name (str): Name of the feed
+            seconds (float): Seconds between scans
+        """
+        self._intervals[name] = seconds
+        return
+
+    def _adapt(self, feed, busy: bool) -> None:
+        """
+        Backs a feed's interval off after a quiet scan, or tightens it
+        after a busy one.
+
+        Args:
+            feed (Feed): Feed that was scanned
+            busy (bool): If the scan found new stories
+        """
+        interval = self._intervals[feed.name]
+        if busy:
+            interval = max(feed.min_interval, interval * TIGHTEN)
+        else:
+            interval = min(feed.max_interval, interval * BACKOFF)
+        if interval != self._intervals[feed.name]:
+            print("Scanning " + feed.name + " news every", round(interval), "seconds.")
+        self.set_interval(feed.name, interval)
+        return
+
+    def start(self) -> None:
+        """
+        Starts scanning every feed. Does nothing if already started.
+        """
+        if self.running:
+            return
+        for i, feed in enumerate(self.feeds):
+            delay = self.start_spread * i / len(self.feeds)
+            self._tasks[feed.name] = asyncio.ensure_future(self._run(feed, delay))
+        return
+
+    async def _run(self, feed, delay: float) -> None:
+        """
+        Scans a feed forever, waiting its interval between scans.
+
+        Args:
+            feed (Feed): Feed to scan
+            delay (float): Seconds to wait before the first scan
+        """
+        await asyncio.sleep(delay)
+        while True:
+            started = time.monotonic()
+            async with self._slots:
+                print("Scanning " + feed.name + " news.")
+                try:
+                    found = await self.scan(feed)
+                    if self.adaptive:
+                        self._adapt(feed, bool(found))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Keep the loop alive; the next scan may well work
+                    print("Err scanning " + feed.name + " news: ", e)
+            interval = self._intervals[feed.name]
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+            await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+    async def stop(self) -> None:
+        """
+        Cancels every feed's loop and waits for them to finish.
+        """
+        tasks, self._tasks = list(self._tasks.values()), {}
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return
@@ -0,0 +1,141 @@
+# Persistent index of stories each feed has already posted.
+
+# Stories are identified by their normalized headline title (the date
+# shown on Google News changes between scans, so it isn't part of the
+# identity). A scan diffs its headlines against the index as a set, so
+# reordering on the page never causes a repost and stories added at any
+# position are picked up. The index survives restarts, and stories that
+# haven't been on the page for a while are pruned.
+
+import sqlite3
+import threading
+import time
+
+from _article_cache import normalize_title
+
+INDEX_PATH = "./data/seen_stories.sqlite"
+RETENTION = 7 * 24 * 60 * 60  # Seconds a story is kept after it was last seen
+
+
+def story_key(headline: list) -> str:
+    """
+    Gets the identity of a story from its headline.
+
+    Args:
+        headline (list): Date and title of the headline
+
+    Returns:
+        str: Story key
+    """
+    return normalize_title(headline[1])
+
+
+def dedupe_headlines(headlines: list) -> list:
+    """
+    Removes repeated stories from a list of headlines, keeping the
+    first occurrence of each and the original order.
+
+    Args:
+        headlines (list): Headlines (date, title, ...)
+
+    Returns:
+        list: Unique headlines
+    """
+    seen = set()
+    results = []
+    for headline in headlines:
+        key = story_key(headline)
+        if key not in seen:
+            seen.add(key)
+            results.append(headline)
+    return results
+
+
+class StoryIndex:
+    """
+    SQLite index of the stories posted per feed.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, retention: float = RETENTION) -> None:
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS seen (
+                    feed TEXT,
+                    story_key TEXT,
+                    first_seen REAL,
+                    last_seen REAL,
+                    PRIMARY KEY (feed, story_key)
+                )""")
+            self._db.execute(
+                "DELETE FROM seen WHERE last_seen <= ?", (time.time() - retention,)
+            )
+        return
+
+    def diff(self, feed: str, headlines: list) -> list:
+        """
+        Gets the stories in a scan that the feed hasn't posted yet.
+        Stories that were posted before and are still on the page are
+        marked as seen again, so they aren't pruned while they're up.
+
+        Args:
+            feed (str): Name of the feed
+            headlines (list): Headlines (date, title, ...) from the scan
+
+        Returns:
+            list: New headlines only, in their original order
+        """
+        headlines = dedupe_headlines(headlines)
+        keys = [story_key(headline) for headline in headlines]
+        with self._lock, self._db:
+            seen = {
+                row[0]
+                for row in self._db.execute(
+                    "SELECT story_key FROM seen WHERE feed = ? AND story_key IN ("
+                    + ", ".join("?" * len(keys))
+                    + ")",
+                    [feed] + keys,
+                )
+            }
+            self._db.executemany(
+                "UPDATE seen SET last_seen = ? WHERE feed = ? AND story_key = ?",
+                [(time.time(), feed, key) for key in seen],
+            )
+        return [headline for headline, key in zip(headlines, keys) if key not in seen]
+
+    def mark_seen(self, feed: str, headlines: list) -> None:
+        """
+        Records stories as posted by a feed.
+
+        Args:
+            feed (str): Name of the feed
+            headlines (list): Headlines (date, title, ...) that were posted
+        """
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                """INSERT INTO seen VALUES (?, ?, ?, ?)
+                ON CONFLICT(feed, story_key) DO UPDATE SET last_seen = excluded.last_seen""",
+                [(feed, story_key(headline), now, now) for headline in headlines],
+            )
+        return
+
+    def forget(self, feed: str) -> None:
+        """
+        Forgets every story a feed has posted, so they're all new again.
+
+        Args:
+            feed (str): Name of the feed
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM seen WHERE feed = ?", (feed,))
+        return
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._db.close()
+        return
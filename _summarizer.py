@@ -10,42 +10,930 @@
 # range of tokens / ratio of summarization to return. This library uses
 # CUDA if compatible GPU if available by default, and requires pytorch.
 
-from summarizer import Summarizer  # Bert Summarizer
-
-model = Summarizer()
-
 # Transformers pipeline from HF will automatically detect
 # and use CUDA GPU if available. We use this model pipeline
 # in our news bot because it works without any asynchronous
 # processing errors with Discord.py, unlike the library above.
 
-from transformers import pipeline
+# Both models (and their libraries) are loaded lazily on first use,
+# so importing this module is instant and a model that's never used
+# is never loaded. Call Summarizer.warm_up() to load them ahead of time.
 
-bert_summarizer = pipeline(
-    "summarization",
-    model="facebook/bart-large-cnn",
-    tokenizer="facebook/bart-large-cnn",
-)
+# On CPU-only hosts, BART can also run with dynamic int8 quantization
+# ("int8") or as an ONNX Runtime export ("onnx", needs the optimum[onnxruntime]
+# package) instead of fp32 PyTorch ("fp32"). Either falls back to fp32 if it
+# can't be loaded. Run `python _summarizer.py --compare-inference` to compare
+# their latency on this machine.
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+
+BART_MODEL = "facebook/bart-large-cnn"
+BART_INFERENCE = "fp32"  # "fp32", "int8" or "onnx"
+INFERENCE_MODES = ("fp32", "int8", "onnx")
 MIN_LENGTH = 0.1
 MAX_LENGTH = 0.25
+MAX_INPUT_WORDS = 512  # Texts are cut to this many words before summarizing
+BATCH_SIZE = 8  # Max number of texts run through the model at once
+# BART reads up to 1024 tokens; windows leave room for its special tokens
+CHUNK_TOKENS = 1000
+MIN_CHUNK_SUMMARY_TOKENS = 16  # Floor for summaries of short windows
 
 
 K_MAX = 4  # Max num of sentences in our cluster, to return in summary
 
+# Routing between backends (see Summarizer.choose_backend)
+DEFAULT_BACKEND = "auto"
+LONG_ARTICLE_BACKEND = "textrank"
+LONG_ARTICLE_WORDS = 1000  # Texts longer than this go to LONG_ARTICLE_BACKEND
+# Starting guesses of seconds per input word on CPU, refined as summaries run
+SECONDS_PER_WORD = {
+    "bart": 0.01,
+    "bart_chunked": 0.01,
+    "textrank": 0.00001,
+    "bert_extractive": 0.002,
+}
+
+# Memo of finished summaries (see SummaryMemo)
+MEMO_SIZE = 1024  # Summaries kept in memory
+MEMO_PATH = "./data/summary_memo.sqlite"  # On-disk tier; None to disable
+MEMO_TTL = 7 * 24 * 60 * 60  # Seconds a summary stays in the on-disk tier
+MEMO_MAX_ENTRIES = 10000  # Summaries kept in the on-disk tier
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[\"'A-Z0-9])")
+WORD = re.compile(r"[a-z0-9']+")
+STOPWORDS = set(
+    """a an and are as at be been but by for from had has have he her his i in
+    is it its of on or said says she that the their they this to was were will
+    with you we who which would not""".split()
+)
+
+_models = {}
+# Reentrant, since a failed int8 / ONNX load falls back to loading fp32
+_models_lock = threading.RLock()
+
+
+def _load_bart(inference: str):
+    """
+    Builds a BART summarization pipeline for an inference mode.
+
+    Args:
+        inference (str): "fp32", "int8" or "onnx"
+
+    Returns:
+        transformers.SummarizationPipeline: BART summarization pipeline
+    """
+    from transformers import pipeline, AutoTokenizer
+
+    if inference == "fp32":
+        return pipeline("summarization", model=BART_MODEL, tokenizer=BART_MODEL)
+    tokenizer = AutoTokenizer.from_pretrained(BART_MODEL)
+    if inference == "int8":
+        import torch
+        from transformers import AutoModelForSeq2SeqLM
+
+        model = AutoModelForSeq2SeqLM.from_pretrained(BART_MODEL)
+        # Linear layers (most of BART's compute) run with int8 weights
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    elif inference == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        model = ORTModelForSeq2SeqLM.from_pretrained(BART_MODEL, export=True)
+    else:
+        raise ValueError("Unknown inference mode: " + inference)
+    return pipeline("summarization", model=model, tokenizer=tokenizer)
+
+
+def get_bart_pipeline(inference: str = BART_INFERENCE):
+    """
+    Gets the BART summarization pipeline for an inference mode, loading
+    it on first use. Falls back to fp32 if the mode can't be loaded.
+
+    Args:
+        inference (str, optional): "fp32", "int8" or "onnx".
+            Defaults to BART_INFERENCE.
+
+    Returns:
+        transformers.SummarizationPipeline: BART summarization pipeline
+    """
+    key = "bart_" + inference
+    with _models_lock:
+        if key not in _models:
+            try:
+                _models[key] = _load_bart(inference)
+            except Exception as e:
+                if inference == "fp32":
+                    raise
+                print("Err loading " + inference + " BART, using fp32: ", e)
+                _models[key] = get_bart_pipeline("fp32")
+    return _models[key]
+
+
+def get_extractive_model():
+    """
+    Gets the bert-extractive-summarizer model, loading it on first use.
+
+    Returns:
+        summarizer.Summarizer: Bert extractive summarizer
+    """
+    with _models_lock:
+        if "extractive" not in _models:
+            from summarizer import Summarizer as BertSummarizer
+
+            _models["extractive"] = BertSummarizer()
+    return _models["extractive"]
+
+
+class PerSampleLengthLogitsProcessor:
+    """
+    Applies a separate min / max summary length to each text in a
+    batch, since generate() only takes one min_length / max_length
+    for the whole batch.
+
+    Works like HF's MinLengthLogitsProcessor (EOS is blocked until the
+    min length) and ForcedEOSTokenLogitsProcessor (EOS is forced at the
+    max length), but per text. Beam search rows are mapped back to their
+    text, since each text is expanded to num_beams consecutive rows.
+    (It's a plain callable rather than a LogitsProcessor subclass so
+    transformers isn't imported until a model is actually loaded.)
+    """
+
+    def __init__(self, min_lengths: list, max_lengths: list, eos_token_id: int):
+        self.min_lengths = min_lengths
+        self.max_lengths = max_lengths
+        self.eos_token_id = eos_token_id
+
+    def __call__(self, input_ids, scores):
+        num_beams = input_ids.shape[0] // len(self.min_lengths)
+        cur_len = input_ids.shape[-1]
+        for row in range(input_ids.shape[0]):
+            i = row // num_beams
+            if cur_len < self.min_lengths[i]:
+                scores[row, self.eos_token_id] = -float("inf")
+            elif cur_len >= self.max_lengths[i] - 1:
+                scores[row, :] = -float("inf")
+                scores[row, self.eos_token_id] = 0
+        return scores
+
+
+# Backends register themselves here by name, so the router (and config)
+# can pick one per text without the rest of the bot knowing about them
+BACKENDS = {}
+
+
+def register_backend(name: str):
+    """
+    Class decorator that registers a summarizer backend by name.
+
+    Args:
+        name (str): Name used to select the backend
+
+    Returns:
+        callable: Decorator
+    """
+
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+
+    return decorator
+
+
+class SummarizerBackend:
+    """
+    Base class for summarizer backends.
+
+    A backend loads whatever it needs lazily in load(), and summarizes
+    lists of texts, where min_length / max_length are ratios of each text.
+    """
+
+    name = None
+
+    def load(self) -> None:
+        """
+        Loads the backend's model, if it has one.
+        """
+        return
+
+    def summarize_batch(
+        self, texts: list, min_length: float, max_length: float
+    ) -> list:
+        """
+        Summarizes a list of texts.
+
+        Args:
+            texts (list): Texts to summarize
+            min_length (float): Min length of each summary, as a ratio of its text
+            max_length (float): Max length of each summary, as a ratio of its text
+
+        Returns:
+            list: Summaries, in the same order as the texts
+        """
+        raise NotImplementedError
+
+
+@register_backend("bart")
+class BartBackend(SummarizerBackend):
+    """
+    Abstractive summaries with BART through the HF transformers pipeline.
+    Best quality, but by far the most expensive backend, and it only
+    sees the first MAX_INPUT_WORDS words of a text.
+    """
+
+    def __init__(
+        self, batch_size: int = BATCH_SIZE, inference: str = BART_INFERENCE
+    ) -> None:
+        self.batch_size = batch_size
+        self.inference = inference
+        return
+
+    def load(self) -> None:
+        get_bart_pipeline(self.inference)
+        return
+
+    def _prepare(self, text: str, min_length: float, max_length: float) -> tuple:
+        """
+        Cuts text to the model's input limit, and turns the min / max
+        length ratios into a number of tokens for that text.
+
+        Args:
+            text (str): Text to summarize
+            min_length (float): Min length of the summary, as a ratio of the text
+            max_length (float): Max length of the summary, as a ratio of the text
+
+        Returns:
+            tuple: Cut text, min length and max length
+        """
+        # Limit text to 512 tokens since that's Bert's max input length
+        text = " ".join(text.split(" ")[:MAX_INPUT_WORDS])
+        # print("The text to summarize: ", text)
+        min_length = round(min_length * len(text.split(" ")))
+        # print("Min length found: ", min_length)
+        max_length = round(max_length * len(text.split(" ")))
+        # print("Max length found: ", max_length)
+        return text, min_length, max_length
+
+    def summarize_batch(
+        self, texts: list, min_length: float, max_length: float
+    ) -> list:
+        """
+        Summarizes a list of texts with the BART model in padded batches.
+
+        Args:
+            texts (list): Texts to summarize
+            min_length (float): Min length of each summary, as a ratio of its text
+            max_length (float): Max length of each summary, as a ratio of its text
+
+        Returns:
+            list: Summaries, in the same order as the texts
+        """
+        prepared = [self._prepare(text, min_length, max_length) for text in texts]
+        return self._generate(prepared)
+
+    def _generate(self, items: list, lengths: list = None) -> list:
+        """
+        Runs texts through BART in padded batches.
+
+        Texts are sorted by token length so each batch holds texts of
+        similar length (which keeps padding to a minimum), and each text
+        still gets its own min / max summary length.
+
+        Args:
+            items (list): (text, min length, max length) of each text,
+                with lengths in tokens
+            lengths (list, optional): Token length of each text, if
+                already known. Defaults to None (texts are tokenized).
+
+        Returns:
+            list: Summaries, in the same order as the items
+        """
+        from transformers import LogitsProcessorList
+
+        bert_summarizer = get_bart_pipeline(self.inference)
+        if len(items) == 1:
+            text, min_length, max_length = items[0]
+            return [
+                bert_summarizer(
+                    text, min_length=min_length, max_length=max_length, do_sample=False
+                )[0]["summary_text"]
+            ]
+        if lengths is None:
+            tokenizer = bert_summarizer.tokenizer
+            lengths = [
+                len(tokenizer(text, truncation=True)["input_ids"])
+                for text, _, _ in items
+            ]
+        order = sorted(range(len(items)), key=lambda i: lengths[i])
+        results = [None] * len(items)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            min_lengths = [items[i][1] for i in batch]
+            max_lengths = [items[i][2] for i in batch]
+            processor = PerSampleLengthLogitsProcessor(
+                min_lengths, max_lengths, bert_summarizer.model.config.eos_token_id
+            )
+            outputs = bert_summarizer(
+                [items[i][0] for i in batch],
+                batch_size=len(batch),
+                truncation=True,
+                min_length=0,
+                max_length=max(max_lengths),
+                logits_processor=LogitsProcessorList([processor]),
+                do_sample=False,
+            )
+            for i, output in zip(batch, outputs):
+                results[i] = output["summary_text"]
+        return results
+
+
+@register_backend("bart_chunked")
+class ChunkedBartBackend(BartBackend):
+    """
+    BART over the whole text, map-reduce style: the text is tokenized
+    once with the model's tokenizer, split on sentence boundaries into
+    windows that fit the model, and every window (of every text) is
+    summarized as one batch. The window summaries of each text are
+    then joined and summarized again, until they fit in one window.
+
+    Long articles get full coverage with a predictable cost, and summary
+    lengths are counted in real tokens rather than words.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = BATCH_SIZE,
+        inference: str = BART_INFERENCE,
+        chunk_tokens: int = CHUNK_TOKENS,
+    ) -> None:
+        super().__init__(batch_size, inference)
+        self.chunk_tokens = chunk_tokens
+        return
+
+    def _chunk(self, text: str) -> list:
+        """
+        Splits text into windows of whole sentences that fit the model.
+        Sentences longer than a window are split on token boundaries.
+
+        Args:
+            text (str): Text to split
+
+        Returns:
+            list: (window text, token count) of each window
+        """
+        tokenizer = get_bart_pipeline(self.inference).tokenizer
+        sentences = [s for s in SENTENCE_BOUNDARY.split(" ".join(text.split())) if s]
+        if not sentences:
+            return [("", 0)]
+        # One tokenizer call for all the sentences of the text
+        encoded = tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        pieces = []
+        for sentence, ids in zip(sentences, encoded):
+            if len(ids) <= self.chunk_tokens:
+                pieces.append((sentence, len(ids)))
+                continue
+            for start in range(0, len(ids), self.chunk_tokens):
+                window = ids[start : start + self.chunk_tokens]
+                pieces.append((tokenizer.decode(window), len(window)))
+        chunks = []
+        current = []
+        current_tokens = 0
+        for piece, num_tokens in pieces:
+            if current and current_tokens + num_tokens > self.chunk_tokens:
+                chunks.append((" ".join(current), current_tokens))
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += num_tokens
+        chunks.append((" ".join(current), current_tokens))
+        return chunks
+
+    def summarize_batch(
+        self, texts: list, min_length: float, max_length: float
+    ) -> list:
+        """
+        Summarizes a list of texts with map-reduce over BART windows.
+
+        The final summary of each text gets the min / max length ratios
+        of at most one window of tokens, so summaries of long articles
+        stay about as long as those of short ones.
+
+        Args:
+            texts (list): Texts to summarize
+            min_length (float): Min length of each summary, as a ratio of its text
+            max_length (float): Max length of each summary, as a ratio of its text
+
+        Returns:
+            list: Summaries, in the same order as the texts
+        """
+        results = [None] * len(texts)
+        targets = {}
+        pending = dict(enumerate(texts))
+        while pending:
+            # Map: every window of every pending text, in one batch
+            jobs = []
+            for i, text in pending.items():
+                chunks = self._chunk(text)
+                if i not in targets:
+                    num_tokens = min(sum(n for _, n in chunks), self.chunk_tokens)
+                    targets[i] = (
+                        round(min_length * num_tokens),
+                        round(max_length * num_tokens),
+                    )
+                if len(chunks) == 1:
+                    # Fits in one window: this is the final summary
+                    chunk, num_tokens = chunks[0]
+                    high = min(targets[i][1], num_tokens)
+                    jobs.append(
+                        (i, True, chunk, num_tokens, min(targets[i][0], high), high)
+                    )
+                    continue
+                for chunk, num_tokens in chunks:
+                    high = max(
+                        round(max_length * num_tokens),
+                        min(num_tokens, MIN_CHUNK_SUMMARY_TOKENS),
+                    )
+                    low = min(round(min_length * num_tokens), high)
+                    jobs.append((i, False, chunk, num_tokens, low, high))
+            # The windows' token counts are known, so they aren't tokenized again
+            summaries = self._generate(
+                [(chunk, low, high) for _, _, chunk, _, low, high in jobs],
+                lengths=[num_tokens for _, _, _, num_tokens, _, _ in jobs],
+            )
+            # Reduce: join the window summaries of each text, and summarize
+            # them again on the next pass (they may still need several windows)
+            pending = {}
+            for (i, final, _, _, _, _), summary in zip(jobs, summaries):
+                if final:
+                    results[i] = summary
+                else:
+                    pending[i] = (pending.get(i, "") + " " + summary).strip()
+        return results
+
+
+def _first_words(text: str, max_words: float) -> str:
+    """
+    Cuts a text to its first max_words words (at least one).
+
+    Args:
+        text (str): Text with single spaces between words
+        max_words (float): Max number of words to keep
+
+    Returns:
+        str: The text's first words
+    """
+    return " ".join(text.split(" ")[: max(1, round(max_words))])
+
+
+@register_backend("textrank")
+class TextRankBackend(SummarizerBackend):
+    """
+    Extractive summaries with TextRank: sentences are ranked by PageRank
+    over a graph of their TF-IDF cosine similarities, and the top ones
+    are returned in their original order.
+
+    Runs in milliseconds on CPU and reads the whole text, so it's the
+    better choice for long articles. Only needs numpy / scipy / networkx.
+    """
+
+    def summarize_one(self, text: str, min_length: float, max_length: float) -> str:
+        """
+        Summarizes a single text with TextRank.
+
+        Args:
+            text (str): Text to summarize
+            min_length (float): Min length of the summary, as a ratio of the text
+            max_length (float): Max length of the summary, as a ratio of the text
+
+        Returns:
+            str: Summary made of the text's top ranked sentences
+        """
+        import numpy as np
+        import networkx as nx
+        from scipy import sparse
+
+        text = " ".join(text.split())
+        # Summary lengths are ratios of what BART would have read, so
+        # summaries of long articles stay about as long as BART's
+        num_words = min(len(text.split()), MAX_INPUT_WORDS)
+        min_words = min_length * num_words
+        max_words = max_length * num_words
+        sentences = [s for s in SENTENCE_BOUNDARY.split(text) if s.strip()]
+        if len(sentences) <= 2:
+            # Too few sentences to rank (or no punctuation to split on):
+            # still keep the summary within its length
+            return _first_words(text, max_words)
+
+        # TF-IDF vectors of the sentences, as a sparse matrix
+        vocab = {}
+        rows, cols, counts = [], [], []
+        for i, sentence in enumerate(sentences):
+            for word in WORD.findall(sentence.lower()):
+                if word in STOPWORDS:
+                    continue
+                rows.append(i)
+                cols.append(vocab.setdefault(word, len(vocab)))
+                counts.append(1.0)
+        if not vocab:
+            return _first_words(sentences[0], max_words)
+        tf = sparse.csr_matrix(
+            (counts, (rows, cols)), shape=(len(sentences), len(vocab))
+        )
+        tf.sum_duplicates()
+        df = np.bincount(tf.indices, minlength=len(vocab))
+        idf = np.log((1 + len(sentences)) / (1 + df)) + 1
+        tfidf = sparse.csr_matrix(tf.multiply(idf))
+        norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        tfidf = sparse.diags(1 / norms) @ tfidf
+
+        # Rank sentences by PageRank over their similarity graph
+        similarity = (tfidf @ tfidf.T).toarray()
+        np.fill_diagonal(similarity, 0)
+        graph = nx.from_numpy_array(similarity)
+        try:
+            scores = nx.pagerank(graph, weight="weight")
+        except nx.PowerIterationFailedConvergence:
+            scores = dict(graph.degree(weight="weight"))
+        ranked = sorted(range(len(sentences)), key=lambda i: -scores[i])
+
+        chosen = []
+        words = 0
+        for i in ranked:
+            length = len(sentences[i].split())
+            if chosen and words >= min_words and words + length > max_words:
+                continue
+            chosen.append(i)
+            words += length
+            if words >= max_words:
+                break
+        return " ".join(sentences[i] for i in sorted(chosen))
+
+    def summarize_batch(
+        self, texts: list, min_length: float, max_length: float
+    ) -> list:
+        return [self.summarize_one(text, min_length, max_length) for text in texts]
+
+
+@register_backend("bert_extractive")
+class BertExtractiveBackend(SummarizerBackend):
+    """
+    Extractive summaries with bert-extractive-summarizer, which clusters
+    BERT sentence embeddings and picks the optimal number of sentences.
+    The min / max length ratios are ignored.
+    """
+
+    def __init__(self, max_sentences: int = K_MAX) -> None:
+        self.max_sentences = max_sentences
+        return
+
+    def load(self) -> None:
+        get_extractive_model()
+        return
+
+    def summarize_batch(
+        self, texts: list, min_length: float, max_length: float
+    ) -> list:
+        model = get_extractive_model()
+        results = []
+        for text in texts:
+            text = " ".join(text.split())
+            num_sentences = model.calculate_optimal_k(text, k_max=self.max_sentences)
+            results.append(model(text, num_sentences=num_sentences))
+        return results
+
+
+class SummaryMemo:
+    """
+    Two-tier memo of summaries, keyed by a hash of the cleaned text,
+    the backend and the length params: an in-memory LRU in front of a
+    SQLite table that survives restarts. The same wire story posted
+    under different headlines / links is only summarized once.
+
+    The on-disk tier drops summaries older than its TTL, then the least
+    recently used ones beyond its max entries, when it's opened and on
+    every new summary, so it doesn't grow forever.
+    """
+
+    def __init__(
+        self,
+        size: int = MEMO_SIZE,
+        path: str = MEMO_PATH,
+        ttl: float = MEMO_TTL,
+        max_entries: int = MEMO_MAX_ENTRIES,
+    ) -> None:
+        self.size = size
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        return
+
+    def _get_db(self) -> sqlite3.Connection:
+        """
+        Opens the on-disk tier on first use.
+        """
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            with self._db:
+                self._db.execute("""CREATE TABLE IF NOT EXISTS summaries (
+                        key TEXT PRIMARY KEY,
+                        summary TEXT,
+                        created_at REAL,
+                        accessed_at REAL
+                    )""")
+                columns = [
+                    row[1] for row in self._db.execute("PRAGMA table_info(summaries)")
+                ]
+                if "created_at" not in columns:
+                    # Memo from before the on-disk tier was pruned
+                    for column in ("created_at", "accessed_at"):
+                        self._db.execute(
+                            "ALTER TABLE summaries ADD COLUMN " + column + " REAL"
+                        )
+                    self._db.execute(
+                        "UPDATE summaries SET created_at = ?, accessed_at = ?",
+                        (time.time(), time.time()),
+                    )
+            self._evict()
+        return self._db
+
+    def _evict(self) -> None:
+        """
+        Removes expired summaries from disk, then the least recently
+        used ones until the on-disk tier is within its size limit.
+        """
+        with self._db:
+            self._db.execute(
+                "DELETE FROM summaries WHERE created_at <= ?",
+                (time.time() - self.ttl,),
+            )
+            self._db.execute(
+                """DELETE FROM summaries WHERE key IN (
+                    SELECT key FROM summaries ORDER BY accessed_at DESC
+                    LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+        return
+
+    def key(self, text: str, backend: str, min_length: float, max_length: float) -> str:
+        """
+        Builds the memo key of a summary.
+
+        Args:
+            text (str): Cleaned text
+            backend (str): Backend (and any options that change its output)
+            min_length (float): Min length ratio
+            max_length (float): Max length ratio
+
+        Returns:
+            str: SHA-256 hex digest
+        """
+        raw = "\0".join([text, backend, repr(min_length), repr(max_length)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str:
+        """
+        Gets a memoized summary, from memory or else from disk.
+
+        Args:
+            key (str): Memo key
+
+        Returns:
+            str: Summary, or None if it isn't memoized
+        """
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+            if not self.path:
+                return None
+            now = time.time()
+            with self._get_db() as db:
+                row = db.execute(
+                    "SELECT summary FROM summaries WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+                if row is None:
+                    return None
+                db.execute(
+                    "UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+            self._remember(key, row[0])
+            return row[0]
+
+    def _remember(self, key: str, summary: str) -> None:
+        """
+        Adds a summary to the in-memory LRU, evicting the oldest if full.
+        """
+        self._lru[key] = summary
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+        return
+
+    def put(self, key: str, summary: str) -> None:
+        """
+        Memoizes a summary in both tiers.
+
+        Args:
+            key (str): Memo key
+            summary (str): Summary
+        """
+        with self._lock:
+            self._remember(key, summary)
+            if self.path:
+                now = time.time()
+                with self._get_db() as db:
+                    db.execute(
+                        "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+                        (key, summary, now, now),
+                    )
+                self._evict()
+        return
+
 
 class Summarizer:
     """
-    Summarizes text using Bert Summarizer with sentence embeddings.
+    Summarizes text with one of the registered backends.
 
-    In the future, we should have multiple summarizers to choose from,
-    such as LexRank, TextRank, etc. and we should have a way to dynamically
-    choose the best summarizer for the given text based on the length.
+    With the "auto" backend, a router picks a backend per text based on
+    its length and a latency budget: BART for articles it can read in
+    full (if its expected latency fits the budget), and TextRank for long
+    articles, which BART would mostly cut off anyway, or when BART would
+    be too slow. Backends are only created (and their models loaded)
+    once they're actually selected.
 
     Since BERT has an input length limit of 512 tokens, it will not be the
     best choice for large contexts or lengthy articles.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        backend: str = DEFAULT_BACKEND,
+        long_article_words: int = LONG_ARTICLE_WORDS,
+        latency_budget: float = None,
+        long_article_backend: str = LONG_ARTICLE_BACKEND,
+        bart_inference: str = BART_INFERENCE,
+        memo_size: int = MEMO_SIZE,
+        memo_path: str = MEMO_PATH,
+        memo_ttl: float = MEMO_TTL,
+        memo_max_entries: int = MEMO_MAX_ENTRIES,
+    ) -> None:
+        self._backends = {}
+        # Smoothed seconds per input word of each backend, for the router
+        self._seconds_per_word = dict(SECONDS_PER_WORD)
+        self._lock = threading.Lock()
+        self.configure(
+            backend,
+            long_article_words,
+            latency_budget,
+            long_article_backend,
+            bart_inference,
+            memo_size,
+            memo_path,
+            memo_ttl,
+            memo_max_entries,
+        )
+        return
+
+    def configure(
+        self,
+        backend: str = DEFAULT_BACKEND,
+        long_article_words: int = LONG_ARTICLE_WORDS,
+        latency_budget: float = None,
+        long_article_backend: str = LONG_ARTICLE_BACKEND,
+        bart_inference: str = BART_INFERENCE,
+        memo_size: int = MEMO_SIZE,
+        memo_path: str = MEMO_PATH,
+        memo_ttl: float = MEMO_TTL,
+        memo_max_entries: int = MEMO_MAX_ENTRIES,
+    ) -> None:
+        """
+        Sets how texts are routed to backends, how BART runs, and
+        where finished summaries are memoized.
+
+        Args:
+            backend (str, optional): Backend to always use, or "auto" to route
+                by length and latency budget. Defaults to DEFAULT_BACKEND.
+            long_article_words (int, optional): Texts with more words than this
+                go to the long article backend. Defaults to LONG_ARTICLE_WORDS.
+            latency_budget (float, optional): Max seconds a single summary should
+                take; BART is skipped when it's expected to take longer.
+                Defaults to None (no budget).
+            long_article_backend (str, optional): Backend for long texts, e.g.
+                "textrank" (fast) or "bart_chunked" (abstractive, full coverage).
+                Defaults to LONG_ARTICLE_BACKEND.
+            bart_inference (str, optional): How the BART backends run: "fp32",
+                "int8" or "onnx". Defaults to BART_INFERENCE.
+            memo_size (int, optional): Summaries memoized in memory.
+                Defaults to MEMO_SIZE.
+            memo_path (str, optional): SQLite file of the on-disk memo, or None
+                to only memoize in memory. Defaults to MEMO_PATH.
+            memo_ttl (float, optional): Seconds a summary stays in the
+                on-disk memo. Defaults to MEMO_TTL.
+            memo_max_entries (int, optional): Summaries kept in the on-disk
+                memo. Defaults to MEMO_MAX_ENTRIES.
+        """
+        for name in (backend, long_article_backend):
+            if name != "auto" and name not in BACKENDS:
+                raise ValueError("Unknown summarizer backend: " + name)
+        if bart_inference not in INFERENCE_MODES:
+            raise ValueError("Unknown inference mode: " + bart_inference)
+        # Options passed to backends when they're created
+        self.backend_options = {
+            "bart": {"inference": bart_inference},
+            "bart_chunked": {"inference": bart_inference},
+        }
+        with self._lock:
+            self._backends = {}
+        # Finished summaries, so the same text is never summarized twice
+        self.memo = SummaryMemo(memo_size, memo_path, memo_ttl, memo_max_entries)
+        self.backend = backend
+        self.long_article_backend = long_article_backend
+        self.long_article_words = long_article_words
+        self.latency_budget = latency_budget
+        return
+
+    def get_backend(self, name: str) -> SummarizerBackend:
+        """
+        Gets a backend by name, creating it on first use.
+
+        Args:
+            name (str): Backend name
+
+        Returns:
+            SummarizerBackend: Backend instance
+        """
+        with self._lock:
+            if name not in self._backends:
+                options = self.backend_options.get(name, {})
+                self._backends[name] = BACKENDS[name](**options)
+        return self._backends[name]
+
+    def choose_backend(self, text: str) -> str:
+        """
+        Picks the backend to summarize a text with.
+
+        Args:
+            text (str): Text to summarize
+
+        Returns:
+            str: Backend name
+        """
+        if self.backend != "auto":
+            return self.backend
+        num_words = len(text.split())
+        if num_words > self.long_article_words:
+            return self.long_article_backend
+        if self.latency_budget is not None:
+            expected = self._seconds_per_word["bart"] * min(num_words, MAX_INPUT_WORDS)
+            if expected > self.latency_budget:
+                return "textrank"
+        return "bart"
+
+    def record_latency(self, name: str, texts: list, seconds: float) -> None:
+        """
+        Updates a backend's smoothed latency per input word, which the
+        router uses to keep within the latency budget.
+
+        Args:
+            name (str): Backend that summarized the texts
+            texts (list): Texts it summarized
+            seconds (float): How long it took
+        """
+        num_words = sum(min(len(text.split()), MAX_INPUT_WORDS) for text in texts)
+        if num_words == 0:
+            return
+        previous = self._seconds_per_word.get(name, seconds / num_words)
+        self._seconds_per_word[name] = 0.8 * previous + 0.2 * seconds / num_words
+        return
+
+    def warm_up(self) -> None:
+        """
+        Loads the model(s) of the configured backend(s) ahead of time,
+        so the first summary doesn't pay for it. Safe to call more than once.
+        """
+        names = [self.backend]
+        if self.backend == "auto":
+            names = ["bart", self.long_article_backend]
+        for name in names:
+            self.get_backend(name).load()
         return
 
     def clean_text(self, text: str) -> str:
@@ -65,30 +953,102 @@ class Summarizer:
         return text
 
     def summarize(
-        self, text: str, min_length: float = MIN_LENGTH, max_length: float = MAX_LENGTH
+        self,
+        text: str,
+        min_length: float = MIN_LENGTH,
+        max_length: float = MAX_LENGTH,
+        backend: str = None,
     ) -> str:
         """
-        Summarizes text with BERT model using HF transformers pipeline.
+        Summarizes text with the routed (or given) backend.
 
         Args:
-            text (str): _description_
-            min_length (float, optional): _description_. Defaults to MIN_LENGTH.
-            max_length (float, optional): _description_. Defaults to MAX_LENGTH.
+            text (str): Text to summarize
+            min_length (float, optional): Min length of the summary, as a ratio
+                of the text. Defaults to MIN_LENGTH.
+            max_length (float, optional): Max length of the summary, as a ratio
+                of the text. Defaults to MAX_LENGTH.
+            backend (str, optional): Backend to use instead of routing.
 
         Returns:
-            str: _description_
+            str: Summarized text
         """
-        # Limit text to 512 tokens since that's Bert's max input length
-        text = " ".join(text.split(" ")[:512])
-        # print("The text to summarize: ", text)
-        min_length = round(min_length * len(text.split(" ")))
-        # print("Min length found: ", min_length)
-        max_length = round(max_length * len(text.split(" ")))
-        # print("Max length found: ", max_length)
-        result = bert_summarizer(
-            text, min_length=min_length, max_length=max_length, do_sample=False
-        )[0]["summary_text"]
-        return result
+        return self.summarize_batch([text], min_length, max_length, backend)[0]
+
+    def summarize_batch(
+        self,
+        texts: list,
+        min_length: float = MIN_LENGTH,
+        max_length: float = MAX_LENGTH,
+        backend: str = None,
+    ) -> list:
+        """
+        Summarizes a list of texts. Each text is routed to a backend,
+        and each backend summarizes its texts together (BART runs them
+        as padded batches of similar length).
+
+        Args:
+            texts (list): Texts to summarize
+            min_length (float, optional): Min length of each summary, as a ratio
+                of its text. Defaults to MIN_LENGTH.
+            max_length (float, optional): Max length of each summary, as a ratio
+                of its text. Defaults to MAX_LENGTH.
+            backend (str, optional): Backend to use instead of routing.
+
+        Returns:
+            list: Summaries, in the same order as the texts
+        """
+        results = [None] * len(texts)
+        # Memo key -> indices of the texts that need that summary
+        groups = {}
+        for i, text in enumerate(texts):
+            name = backend or self.choose_backend(text)
+            key = self.memo_key(text, name, min_length, max_length)
+            summary = self.memo.get(key)
+            if summary is not None:
+                results[i] = summary
+                continue
+            groups.setdefault(name, {}).setdefault(key, []).append(i)
+        for name, keys in groups.items():
+            # Identical texts in the batch are only summarized once
+            group = [texts[indices[0]] for indices in keys.values()]
+            start = time.perf_counter()
+            summaries = self.get_backend(name).summarize_batch(
+                group, min_length, max_length
+            )
+            self.record_latency(name, group, time.perf_counter() - start)
+            for (key, indices), summary in zip(keys.items(), summaries):
+                self.memo.put(key, summary)
+                for i in indices:
+                    results[i] = summary
+        return results
+
+    def memo_key(
+        self, text: str, name: str, min_length: float, max_length: float
+    ) -> str:
+        """
+        Builds the memo key of a text's summary by a backend.
+
+        Args:
+            text (str): Text to summarize
+            name (str): Backend
+            min_length (float): Min length ratio
+            max_length (float): Max length ratio
+
+        Returns:
+            str: Memo key
+        """
+        return self.memo.key(
+            self.clean_text(text), self._memo_name(name), min_length, max_length
+        )
+
+    def _memo_name(self, name: str) -> str:
+        """
+        Names a backend for memo keys, including options that change
+        its output (like BART's inference mode).
+        """
+        options = self.backend_options.get(name, {})
+        return name + "".join(":" + str(options[option]) for option in sorted(options))
 
     def summarize_optimal(self, text: str, max_sentences: int = K_MAX) -> str:
         """
@@ -104,10 +1064,45 @@ class Summarizer:
             str: Summarized text
         """
         text = self.clean_text(text)
+        model = get_extractive_model()
         num_sentences = model.calculate_optimal_k(text, k_max=max_sentences)
         return model(text, num_sentences=num_sentences)
 
 
+def compare_bart_inference(texts: list, modes: tuple = INFERENCE_MODES) -> dict:
+    """
+    Times BART summarization of the same texts in each inference mode,
+    so int8 / ONNX latency can be compared to the fp32 path.
+
+    Args:
+        texts (list): Texts to summarize
+        modes (tuple, optional): Inference modes to compare.
+            Defaults to INFERENCE_MODES.
+
+    Returns:
+        dict: Seconds per text of each mode
+    """
+    results = {}
+    for mode in modes:
+        backend = BartBackend(inference=mode)
+        backend.load()
+        # One untimed run, so lazy init inside the runtime isn't counted
+        backend.summarize_batch(texts[:1], MIN_LENGTH, MAX_LENGTH)
+        start = time.perf_counter()
+        for text in texts:
+            backend.summarize_batch([text], MIN_LENGTH, MAX_LENGTH)
+        results[mode] = (time.perf_counter() - start) / len(texts)
+        ratio = results[mode] / results.get("fp32", results[mode])
+        print(
+            "BART " + mode + ":",
+            round(results[mode], 3),
+            "s per summary,",
+            round(ratio, 2),
+            "x fp32",
+        )
+    return results
+
+
 if __name__ == "__main__":
     summarizer = Summarizer()
     example_text = """Biden opposes changing Senate rules to raise debt limitPOLITICO2 hours 
@@ -122,5 +1117,7 @@ if __name__ == "__main__":
     print("Summarizing example text: " + example_text)
     summarized = summarizer.summarize(example_text)
     print(summarized)
+    if "--compare-inference" in sys.argv:
+        compare_bart_inference([example_text] * 3)
 else:
     summarizer = Summarizer()
@@ -0,0 +1,500 @@
+# Pool of summarizer worker processes.
+
+# In-process summarization runs one batch at a time on the inference
+# thread, sharing the GIL and memory with the Discord client and the
+# scrapers. The pool instead runs each backend in worker processes that
+# load their own models, each pinned to its own slice of the CPUs with
+# its own torch / BLAS thread count, so throughput scales with cores
+# and the bot's process stays light.
+
+# Texts are routed, memoized and batched in the bot's process, exactly
+# like Summarizer.summarize_batch: only texts that aren't memoized are
+# sent out, as jobs of up to BATCH_SIZE texts of one backend, on a shared
+# queue that idle workers take from. A text that's already being
+# summarized for another scan isn't sent again; its caller waits on the
+# same result. A job that takes longer than the timeout, or whose worker
+# dies (a segfault, the OOM killer...), fails with an error, and the
+# worker is killed and replaced, so the bot keeps running.
+
+# Workers are started with "spawn", so they don't inherit the bot's
+# threads, sockets or loaded models. A spawned process first re-imports
+# its parent's __main__ (the bot, with Discord, Selenium, goose, its config
+# and executors), so this module stands in as __main__ while a worker is
+# started, and workers only import the summarizer.
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from _summarizer import BATCH_SIZE, MIN_LENGTH, MAX_LENGTH
+
+WORKERS = 2  # Worker processes
+JOB_TIMEOUT = 300  # Seconds before a job is abandoned and its worker replaced
+# Env vars that cap the threads of torch, BLAS and ONNX Runtime
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+_start_lock = threading.Lock()  # Workers are started from several threads
+
+
+class WorkerError(Exception):
+    """
+    A summarizer worker died, timed out, or failed a job.
+    """
+
+    pass
+
+
+def _available_cpus() -> list:
+    """
+    Gets the CPUs this process may run on.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _split_cpus(workers: int) -> list:
+    """
+    Splits the available CPUs into one contiguous set per worker (sets
+    are shared round-robin if there are more workers than CPUs).
+
+    Args:
+        workers (int): Number of workers
+
+    Returns:
+        list: CPU set of each worker
+    """
+    cpus = _available_cpus()
+    if workers >= len(cpus):
+        return [[cpus[i % len(cpus)]] for i in range(workers)]
+    size, extra = divmod(len(cpus), workers)
+    sets = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        sets.append(cpus[start:end])
+        start = end
+    return sets
+
+
+def _worker_main(conn, cpus: list, threads: int, options: dict) -> None:
+    """
+    Entry point of a worker process: serves jobs from the pool until
+    told to stop.
+
+    Messages are ("summarize", backend, texts, min_length, max_length),
+    ("warm_up", backends) or None to stop. Replies are ("ok", result)
+    or ("error", message).
+
+    Args:
+        conn (multiprocessing.connection.Connection): Pipe to the pool
+        cpus (list): CPUs to pin the process to, or None to not pin it
+        threads (int): Threads for torch / BLAS / ONNX Runtime
+        options (dict): Options passed to Summarizer.configure
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    if threads:
+        # Set before torch (or anything using BLAS) is first imported
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(threads)
+    from _summarizer import summarizer
+
+    # The pool memoizes in the bot's process
+    summarizer.configure(memo_size=0, memo_path=None, **options)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        try:
+            if message[0] == "summarize":
+                name, texts, min_length, max_length = message[1:]
+                result = summarizer.get_backend(name).summarize_batch(
+                    texts, min_length, max_length
+                )
+            else:
+                for name in message[1]:
+                    summarizer.get_backend(name).load()
+                result = None
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+    conn.close()
+    return
+
+
+def _start_process(process) -> None:
+    """
+    Starts a worker process with this module as the __main__ its child
+    imports, instead of the bot's.
+
+    Args:
+        process (multiprocessing.Process): Process to start
+    """
+    with _start_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            process.start()
+        finally:
+            sys.modules["__main__"] = main
+    return
+
+
+class _Worker:
+    """
+    One worker process and the parent's end of its pipe.
+    """
+
+    def __init__(self, context, cpus: list, threads: int, options: dict) -> None:
+        self.cpus = cpus
+        self.broken = False  # Died or hung, so it has to be replaced
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child, cpus, threads, options),
+            name="news-summarizer",
+            daemon=True,
+        )
+        _start_process(self.process)
+        child.close()
+        return
+
+    def call(self, message: tuple, timeout: float):
+        """
+        Sends a message to the worker and waits for its reply.
+        This blocks, so it's meant to be run on the pool's executor.
+
+        Args:
+            message (tuple): Message to send
+            timeout (float): Seconds to wait for the reply, or None
+
+        Raises:
+            WorkerError: If the worker dies, doesn't reply in time (both
+                mark it broken), or replies with an error
+
+        Returns:
+            Any: Result of the job
+        """
+        try:
+            self.conn.send(message)
+            if not self.conn.poll(timeout):
+                self.broken = True
+                raise WorkerError(
+                    "Summarizer worker timed out after " + str(timeout) + "s"
+                )
+            status, result = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.broken = True
+            raise WorkerError(
+                "Summarizer worker died (exit code "
+                + str(self.process.exitcode)
+                + "): "
+                + repr(e)
+            )
+        if status != "ok":
+            raise WorkerError(result)
+        return result
+
+    def stop(self, timeout: float = 5) -> None:
+        """
+        Asks the worker to stop, killing it if it doesn't.
+        """
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        self.kill()
+        return
+
+    def kill(self) -> None:
+        """
+        Kills the worker (if it's still alive) and closes its pipe.
+        """
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+        return
+
+
+class SummaryPool:
+    """
+    Summarizes texts on a pool of worker processes, with the routing
+    and memo of a Summarizer in the bot's process.
+
+    Workers are started on first use (or by start()). Everything that
+    blocks runs on the pool's own threads, so it can be used from the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        summarizer,
+        workers: int = WORKERS,
+        threads_per_worker: int = None,
+        timeout: float = JOB_TIMEOUT,
+        pin_cpus: bool = True,
+        warm_up: bool = False,
+        batch_size: int = BATCH_SIZE,
+    ) -> None:
+        """
+        Args:
+            summarizer (Summarizer): Routes texts to backends and memoizes
+                summaries; its backend options are passed to the workers
+            workers (int, optional): Worker processes
+            threads_per_worker (int, optional): torch / BLAS threads of each
+                worker. Defaults to the size of its CPU set.
+            timeout (float, optional): Seconds before a job is abandoned
+            pin_cpus (bool, optional): Pin each worker to its own CPUs
+            warm_up (bool, optional): Load the models of the configured
+                backend(s) as soon as each worker starts
+            batch_size (int, optional): Max texts per job
+        """
+        self.summarizer = summarizer
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.timeout = timeout
+        self.pin_cpus = pin_cpus
+        self.warm_up = warm_up
+        self.batch_size = batch_size
+        self._context = multiprocessing.get_context("spawn")
+        self._cpu_sets = _split_cpus(workers)
+        # One thread per worker waiting on its pipe, plus one for the memo
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers + 1, thread_name_prefix="news-summary-pool"
+        )
+        self._jobs = None  # Queue of (backend, texts, min, max, future)
+        self._tasks = []  # One task per worker, feeding it jobs
+        self._workers = {}  # Worker number -> its running worker
+        self._pending = {}  # Memo key -> future of a summary being made
+        self._job_tasks = set()  # Tasks running jobs, until they finish
+        self._closed = False
+        return
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def _run(self, func, *args):
+        """
+        Runs a blocking call on the pool's executor.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _options(self) -> dict:
+        """
+        Summarizer options the workers need to build the same backends.
+        """
+        return {"bart_inference": self.summarizer.backend_options["bart"]["inference"]}
+
+    def _start_worker(self, n: int) -> _Worker:
+        """
+        Starts the nth worker process.
+        """
+        cpus = self._cpu_sets[n]
+        threads = self.threads_per_worker or len(cpus)
+        return _Worker(
+            self._context, cpus if self.pin_cpus else None, threads, self._options()
+        )
+
+    def start(self) -> None:
+        """
+        Starts the workers. Does nothing if already started.
+        """
+        if self.running or self._closed:
+            return
+        self._jobs = asyncio.Queue()
+        for n in range(self.workers):
+            self._tasks.append(asyncio.ensure_future(self._serve(n)))
+        return
+
+    def _backends(self) -> list:
+        """
+        Backends whose models workers load when warming up.
+        """
+        if self.summarizer.backend == "auto":
+            return ["bart", self.summarizer.long_article_backend]
+        return [self.summarizer.backend]
+
+    async def _start(self, n: int) -> _Worker:
+        """
+        Starts the nth worker, and loads its models if warming up.
+        """
+        worker = await self._run(self._start_worker, n)
+        # Tracked right away, so it's stopped even if the pool closes
+        # while it's warming up
+        self._workers[n] = worker
+        print("Started summarizer worker", n, "on CPUs", worker.cpus)
+        if self.warm_up:
+            try:
+                await self._run(worker.call, ("warm_up", self._backends()), None)
+            except WorkerError as e:
+                print("Err warming up summarizer worker", n, ": ", e)
+        return worker
+
+    async def _serve(self, n: int) -> None:
+        """
+        Runs the nth worker: feeds it jobs from the queue, and replaces
+        it whenever it dies or times out.
+        """
+        worker = None
+        try:
+            while True:
+                if worker is None:
+                    worker = await self._start(n)
+                job = await self._jobs.get()
+                if not worker.process.is_alive():
+                    # Died while idle; the job goes to its replacement
+                    print("Replacing dead summarizer worker", n)
+                    await self._run(self._workers.pop(n).kill)
+                    worker = await self._start(n)
+                name, texts, min_length, max_length, future = job
+                started = time.perf_counter()
+                try:
+                    message = ("summarize", name, texts, min_length, max_length)
+                    result = await self._run(worker.call, message, self.timeout)
+                except WorkerError as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    if not worker.broken:
+                        # The job failed, but the worker is fine
+                        continue
+                    print("Replacing summarizer worker", n, ": ", e)
+                    await self._run(self._workers.pop(n).kill)
+                    worker = None
+                    continue
+                self.summarizer.record_latency(
+                    name, texts, time.perf_counter() - started
+                )
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            if n in self._workers:
+                await self._run(self._workers.pop(n).stop)
+
+    def _lookup(self, texts: list, min_length: float, max_length: float) -> list:
+        """
+        Routes each text and looks up its memoized summary.
+        This blocks, so it's run on the pool's executor.
+
+        Returns:
+            list: Backend, memo key and memoized summary (or None) of each text
+        """
+        results = []
+        for text in texts:
+            name = self.summarizer.choose_backend(text)
+            key = self.summarizer.memo_key(text, name, min_length, max_length)
+            results.append((name, key, self.summarizer.memo.get(key)))
+        return results
+
+    def _remember(self, keys: list, summaries: list) -> None:
+        """
+        Memoizes finished summaries.
+        This blocks, so it's run on the pool's executor.
+        """
+        for key, summary in zip(keys, summaries):
+            self.summarizer.memo.put(key, summary)
+        return
+
+    async def _summarize_job(
+        self, name: str, keys: list, texts: list, min_length: float, max_length: float
+    ) -> None:
+        """
+        Runs one job on the workers, and resolves the pending summary of
+        each of its texts.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._jobs.put((name, texts, min_length, max_length, future))
+        try:
+            summaries = await future
+            await self._run(self._remember, keys, summaries)
+            for key, summary in zip(keys, summaries):
+                self._pending[key].set_result(summary)
+        except BaseException as e:
+            for key in keys:
+                if not self._pending[key].done():
+                    self._pending[key].set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            for key in keys:
+                self._pending.pop(key, None)
+        return
+
+    async def summarize_batch(
+        self,
+        texts: list,
+        min_length: float = MIN_LENGTH,
+        max_length: float = MAX_LENGTH,
+    ) -> list:
+        """
+        Summarizes a list of texts on the workers, each with the backend
+        the summarizer routes it to.
+
+        Args:
+            texts (list): Texts to summarize
+            min_length (float, optional): Min length of each summary, as a ratio
+                of its text. Defaults to MIN_LENGTH.
+            max_length (float, optional): Max length of each summary, as a ratio
+                of its text. Defaults to MAX_LENGTH.
+
+        Raises:
+            WorkerError: If a job fails, times out or its worker dies
+
+        Returns:
+            list: Summaries, in the same order as the texts
+        """
+        self.start()
+        routed = await self._run(self._lookup, texts, min_length, max_length)
+        loop = asyncio.get_running_loop()
+        waiting = []  # Future of each text's summary
+        new = {}  # Backend -> memo keys and texts to send to the workers
+        for text, (name, key, summary) in zip(texts, routed):
+            if summary is None and key not in self._pending:
+                self._pending[key] = loop.create_future()
+                new.setdefault(name, []).append((key, text))
+            future = self._pending.get(key)
+            if future is None:
+                # Memoized
+                future = loop.create_future()
+                future.set_result(summary)
+            waiting.append(future)
+        for name, items in new.items():
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start : start + self.batch_size]
+                keys = [key for key, _ in batch]
+                batch_texts = [text for _, text in batch]
+                task = asyncio.ensure_future(
+                    self._summarize_job(name, keys, batch_texts, min_length, max_length)
+                )
+                self._job_tasks.add(task)
+                task.add_done_callback(self._job_tasks.discard)
+        # Shielded, so a cancelled scan doesn't fail other scans waiting
+        # on the same summaries
+        return list(await asyncio.gather(*[asyncio.shield(f) for f in waiting]))
+
+    async def close(self) -> None:
+        """
+        Stops the workers and the pool's threads.
+        """
+        self._closed = True
+        tasks, self._tasks = self._tasks + list(self._job_tasks), []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(WorkerError("Summarizer pool closed"))
+        self._executor.shutdown(wait=True)
+        return
@@ -0,0 +1,679 @@
+# Offline benchmarks of the news pipeline.
+
+# Replays Google News feed pages, search result pages and article HTML
+# from a local HTTP stand-in, with a stubbed Discord client, so the bot
+# can be measured without touching Google, news sites or Discord. By
+# default the fixtures are generated (deterministically, with the same
+# markup as Google News cards); pass --fixtures to replay recorded pages
+# instead. Each benchmark reports p50 / p95 latency and throughput as
+# the number of cards, articles and feeds grows, as JSON, so runs from
+# different changes can be diffed.
+#
+#   python benchmark.py --output bench.json
+#
+# Recorded fixtures are a directory with feeds/*.html (Google News
+# pages), articles/*.html (article pages) and optionally search.html (a
+# Google results page). Card links are served from the articles in turn.
+
+import argparse
+import asyncio
+import contextlib
+import glob
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WORDS = """government election court market city police report officials
+    minister president company workers health storm climate energy trade
+    vote budget talks deal border school water fire rescue power prices
+    bank rates inflation study science space launch team season coach
+    league record strike union court judge ruling law bill senate house
+    governor mayor protest crowd service network data security attack
+    defense troops army peace summit leaders agreement plan program fund
+    hospital doctors patients virus vaccine drug trial research results
+    growth jobs sales profit shares investors economy industry factory""".split()
+
+STOPWORDS = """the a of and to in that for with on was is said by from at as
+    about after over their this which""".split()
+
+FEED_SELECTORS = {"headline": "h4.gPFEn", "date": "time.hvbAAd"}
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Nearest-rank percentile.
+
+    Args:
+        values (list): Samples
+        q (float): Percentile, from 0 to 1
+
+    Returns:
+        float: Value at the percentile
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def result(benchmark: str, params: dict, timings: list, items: int) -> dict:
+    """
+    Summarizes the timings of a benchmark.
+
+    Args:
+        benchmark (str): Name of the benchmark
+        params (dict): Parameters of the run (sizes, backend...)
+        timings (list): Seconds per sample
+        items (int): Items processed over all samples
+
+    Returns:
+        dict: Latency percentiles (ms) and throughput (items / s)
+    """
+    total = sum(timings)
+    entry = {
+        "benchmark": benchmark,
+        "params": params,
+        "samples": len(timings),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+        "mean_ms": round(total / len(timings) * 1000, 3),
+        "throughput_per_s": round(items / total, 3) if total else None,
+    }
+    print(json.dumps(entry), file=sys.stderr)
+    return entry
+
+
+def _rng(*seed) -> random.Random:
+    return random.Random("-".join(str(part) for part in seed))
+
+
+def make_sentence(rng: random.Random) -> str:
+    # Goose scores paragraphs by their stopwords, so the text needs some
+    words = []
+    for _ in range(rng.randint(2, 4)):
+        words += [rng.choice(STOPWORDS), rng.choice(WORDS), rng.choice(WORDS)]
+    return " ".join(words).capitalize() + "."
+
+
+def make_title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(9)).capitalize()
+
+
+def make_article_html(article_id: str, words: int) -> str:
+    """
+    Generates an article page.
+
+    Args:
+        article_id (str): Article id (seeds the text)
+        words (int): About how many words of article text
+
+    Returns:
+        str: HTML
+    """
+    rng = _rng("article", article_id)
+    paragraphs = []
+    count = 0
+    while count < words:
+        paragraph = " ".join(make_sentence(rng) for _ in range(rng.randint(3, 6)))
+        paragraphs.append("<p>" + paragraph + "</p>")
+        count += len(paragraph.split())
+    return (
+        "<html><head><title>"
+        + make_title(rng)
+        + "</title><script>var tracking = '"
+        + "x" * 2000
+        + "';</script></head><body><nav><a href='/'>Home</a> <a href='/world'>World</a></nav>"
+        + "<article><h1>"
+        + make_title(rng)
+        + "</h1>"
+        + "".join(paragraphs)
+        + "</article><footer>Copyright</footer></body></html>"
+    )
+
+
+def make_feed_html(feed: str, cards: int, salt: str, linkless_every: int) -> str:
+    """
+    Generates a Google News page with the markup of its cards.
+
+    Args:
+        feed (str): Feed id (seeds the headlines)
+        cards (int): Number of cards
+        salt (str): Makes every run's headlines and articles new
+        linkless_every (int): Every this many cards has no link, so the
+            headline is searched for instead (0 for never)
+
+    Returns:
+        str: HTML
+    """
+    parts = ["<html><head><script>", "y" * 200000, "</script></head><body><main>"]
+    for i in range(cards):
+        rng = _rng("card", feed, i, salt)
+        article_id = feed + "-" + str(i) + "-" + salt
+        parts.append("<article class='IBr9hb'><div class='XlKvRb'>")
+        if not linkless_every or (i + 1) % linkless_every:
+            parts.append("<a class='WwrzSb' href='./read/" + article_id + "'></a>")
+        parts.append("<div class='vr1PYe'>Source " + str(rng.randint(1, 40)) + "</div>")
+        parts.append("<h4 class='gPFEn'>" + make_title(rng) + "</h4>")
+        parts.append("<time class='hvbAAd'>" + str(i + 1) + " hours ago</time>")
+        parts.append("</div></article>")
+    parts.append("</main></body></html>")
+    return "".join(parts)
+
+
+class Fixtures:
+    """
+    Pages served by the stand-in: recorded ones from a directory, or
+    generated ones.
+    """
+
+    def __init__(
+        self, path: str = None, article_words: int = 600, linkless_every: int = 5
+    ) -> None:
+        self.article_words = article_words
+        self.linkless_every = linkless_every
+        self.feeds = []
+        self.articles = []
+        self.search = None
+        if path:
+            for name in sorted(glob.glob(os.path.join(path, "feeds", "*.html"))):
+                with open(name, "r", encoding="utf-8", errors="replace") as file:
+                    # Card links are served from here, not from Google
+                    self.feeds.append(re.sub(r"<base[^>]*>", "", file.read()))
+            for name in sorted(glob.glob(os.path.join(path, "articles", "*.html"))):
+                with open(name, "r", encoding="utf-8", errors="replace") as file:
+                    self.articles.append(file.read())
+            search = os.path.join(path, "search.html")
+            if os.path.exists(search):
+                with open(search, "r", encoding="utf-8", errors="replace") as file:
+                    self.search = file.read()
+            if not self.feeds or not self.articles:
+                raise ValueError("No feeds/*.html or articles/*.html in " + path)
+        return
+
+    @property
+    def recorded(self) -> bool:
+        return bool(self.feeds)
+
+    def feed(self, feed: str, cards: int, salt: str) -> str:
+        if self.recorded:
+            return self.feeds[
+                int(hashlib.md5(feed.encode()).hexdigest(), 16) % len(self.feeds)
+            ]
+        return make_feed_html(feed, cards, salt, self.linkless_every)
+
+    def article(self, article_id: str) -> str:
+        if self.recorded:
+            digest = int(hashlib.md5(article_id.encode()).hexdigest(), 16)
+            return self.articles[digest % len(self.articles)]
+        return make_article_html(article_id, self.article_words)
+
+    def search_page(self, base_url: str, query: str) -> str:
+        if self.search is not None:
+            return self.search
+        article_id = "search-" + hashlib.md5(query.encode()).hexdigest()[:12]
+        return (
+            "<html><body><div class='g'><div class='yuRUbf'><a href='"
+            + base_url
+            + "/read/"
+            + article_id
+            + "'><h3>Result</h3></a></div></div></body></html>"
+        )
+
+
+class StandIn:
+    """
+    Local HTTP server standing in for Google News, Google search and
+    the news sites.
+    """
+
+    def __init__(self, fixtures: Fixtures) -> None:
+        self.fixtures = fixtures
+        self.base_url = None
+        self.requests = 0
+        self._runner = None
+        return
+
+    async def _feed(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        html = self.fixtures.feed(
+            request.match_info["feed"],
+            int(request.query.get("cards", 20)),
+            request.query.get("salt", ""),
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def _article(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        html = self.fixtures.article(request.match_info["id"])
+        return web.Response(text=html, content_type="text/html")
+
+    async def _search(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        html = self.fixtures.search_page(self.base_url, request.query.get("q", ""))
+        return web.Response(text=html, content_type="text/html")
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/feed/{feed}", self._feed)
+        app.router.add_get("/read/{id}", self._article)
+        app.router.add_get("/search", self._search)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = "http://127.0.0.1:" + str(port)
+        return self.base_url
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+        return
+
+
+class StubMessage:
+    """
+    Message "sent" to the stub Discord client.
+    """
+
+    def __init__(self, content: str, embeds: list) -> None:
+        self.content = content
+        self.embeds = embeds
+        self.created_at = datetime.now(timezone.utc)
+        return
+
+    async def edit(self, content: str = None, embeds: list = None):
+        return StubMessage(content, embeds)
+
+    async def delete(self) -> None:
+        return
+
+
+class StubChannel:
+    def __init__(self) -> None:
+        self.sent = 0
+        return
+
+    async def send(self, content: str, embeds: list = None) -> StubMessage:
+        self.sent += 1
+        return StubMessage(content, embeds)
+
+
+class StubClient:
+    """
+    Discord client that accepts every post without a connection.
+    """
+
+    def __init__(self) -> None:
+        self.channels = {}
+        return
+
+    def get_channel(self, channel_id: int) -> StubChannel:
+        return self.channels.setdefault(channel_id, StubChannel())
+
+    async def fetch_channel(self, channel_id: int) -> StubChannel:
+        return self.get_channel(channel_id)
+
+
+def load_bot_module(workdir: str, args):
+    """
+    Imports discord_news with a benchmark config, from a scratch
+    directory so none of the bot's caches are read or written.
+
+    Returns:
+        module: discord_news
+    """
+    config = {
+        "token": "",
+        "feeds": [
+            {"name": "bench", "url": "http://127.0.0.1/", "channel_id": 1},
+        ],
+        "warm_up_summarizer": False,
+        "summarizer_backend": args.scan_backend,
+        "metrics_port": None,
+        "max_articles_in_flight": args.concurrency,
+    }
+    with open(os.path.join(workdir, "config.json"), "w") as file:
+        json.dump(config, file)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    import discord_news
+
+    # No Google to be polite to, and no memo hits between runs
+    discord_news.GOOGLE_SEARCH_DELAY = 0
+    discord_news.summarizer.configure(
+        backend=args.scan_backend, memo_size=0, memo_path=None
+    )
+    return discord_news
+
+
+def new_bot(mod, base_url: str, run: str):
+    """
+    Creates a bot with empty caches in its own data directory, posting
+    to the stub Discord client.
+    """
+    path = os.path.join(os.getcwd(), "runs", run)
+    os.makedirs(path)
+    os.chdir(path)
+    try:
+        bot = mod.NewsBot()
+    finally:
+        os.chdir(os.path.dirname(os.path.dirname(path)))
+    bot.poster.client = StubClient()
+    mod.GOOGLE_SEARCH_URL = base_url + "/search?q="
+    return bot
+
+
+def bench_parse(fixtures: Fixtures, base_url: str, cards_counts: list, repeats: int):
+    from _feeds import Feed
+    from _headlines import parse_headlines
+
+    results = []
+    for cards in cards_counts:
+        feed = Feed("parse", base_url + "/feed/parse", 1, FEED_SELECTORS, limit=cards)
+        timings = []
+        parsed = 0
+        for repeat in range(repeats):
+            html = fixtures.feed("parse", cards, str(repeat))
+            started = time.perf_counter()
+            parsed += len(parse_headlines(html, feed))
+            timings.append(time.perf_counter() - started)
+        results.append(
+            result(
+                "parse", {"cards": cards, "page_kb": len(html) // 1024}, timings, parsed
+            )
+        )
+    return results
+
+
+def bench_extraction(mod, fixtures: Fixtures, articles: int):
+    bot_extract = mod.NewsBot._extract_text
+    # Goose loads its stopword lists on first use
+    bot_extract(None, fixtures.article("warm-up"))
+    timings = []
+    for i in range(articles):
+        html = fixtures.article("extract-" + str(i))
+        started = time.perf_counter()
+        bot_extract(None, html)
+        timings.append(time.perf_counter() - started)
+    return [result("extraction", {"articles": articles}, timings, articles)]
+
+
+def bench_summarize(
+    mod, fixtures: Fixtures, backends: list, counts: list, repeats: int
+):
+    from _summarizer import MIN_LENGTH, MAX_LENGTH
+
+    texts = [
+        mod.NewsBot._extract_text(None, fixtures.article("summarize-" + str(i)))
+        for i in range(max(counts))
+    ]
+    results = []
+    for name in backends:
+        try:
+            backend = mod.summarizer.get_backend(name)
+            # Loading and the first call aren't part of the measurement
+            backend.summarize_batch(texts[:1], MIN_LENGTH, MAX_LENGTH)
+        except Exception as e:
+            print("Skipping summarizer backend " + name + ": ", e, file=sys.stderr)
+            results.append(
+                {
+                    "benchmark": "summarize",
+                    "params": {"backend": name},
+                    "skipped": str(e),
+                }
+            )
+            continue
+        for count in counts:
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                backend.summarize_batch(texts[:count], MIN_LENGTH, MAX_LENGTH)
+                timings.append(time.perf_counter() - started)
+            results.append(
+                result(
+                    "summarize",
+                    {"backend": name, "articles": count},
+                    timings,
+                    count * repeats,
+                )
+            )
+    return results
+
+
+async def bench_scrape(mod, base_url: str, counts: list, repeats: int):
+    from _headlines import Headline
+
+    results = []
+    for count in counts:
+        timings = []
+        for repeat in range(repeats):
+            run = "scrape-" + str(count) + "-" + str(repeat)
+            bot = new_bot(mod, base_url, run)
+            headlines = [
+                Headline(
+                    "1 hour ago",
+                    make_title(_rng("scrape", run, i)),
+                    base_url + "/read/" + run + "-" + str(i),
+                    "Source",
+                )
+                for i in range(count)
+            ]
+
+            async def scrape(i: int, headline: tuple) -> None:
+                started = time.perf_counter()
+                item = await bot._fetch_story("bench", (i, headline))
+                if item is not None:
+                    await bot._extract_story("bench", item)
+                timings.append(time.perf_counter() - started)
+
+            try:
+                await asyncio.gather(*[scrape(i, h) for i, h in enumerate(headlines)])
+            finally:
+                await bot.close()
+        results.append(result("scrape", {"articles": count}, timings, len(timings)))
+    return results
+
+
+async def bench_scan(
+    mod, base_url: str, feed_counts: list, article_counts: list, repeats: int
+):
+    from _feeds import Feed, FeedState
+
+    results = []
+    for feeds in feed_counts:
+        for articles in article_counts:
+            timings = []
+            feed_timings = []
+            for repeat in range(repeats):
+                run = "scan-" + str(feeds) + "-" + str(articles) + "-" + str(repeat)
+                bot = new_bot(mod, base_url, run)
+                scan_feeds = [
+                    Feed(
+                        "bench" + str(n),
+                        base_url
+                        + "/feed/"
+                        + str(n)
+                        + "?cards="
+                        + str(articles)
+                        + "&salt="
+                        + run,
+                        n + 1,
+                        FEED_SELECTORS,
+                        limit=articles,
+                    )
+                    for n in range(feeds)
+                ]
+                for feed in scan_feeds:
+                    bot.feed_states[feed.name] = FeedState()
+
+                async def scan(feed) -> None:
+                    started = time.perf_counter()
+                    await bot.scan_feed(feed)
+                    feed_timings.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                try:
+                    await asyncio.gather(*[scan(feed) for feed in scan_feeds])
+                finally:
+                    timings.append(time.perf_counter() - started)
+                    await bot.close()
+            params = {
+                "feeds": feeds,
+                "articles": articles,
+                "backend": mod.SUMMARIZER_BACKEND,
+            }
+            results.append(
+                result("scan_cycle", params, timings, feeds * articles * repeats)
+            )
+            results.append(
+                result("scan_feed", params, feed_timings, articles * len(feed_timings))
+            )
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _ints(value: str) -> list:
+    return [int(part) for part in value.split(",") if part]
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the news bot.")
+    parser.add_argument(
+        "--fixtures", help="Directory of recorded pages (feeds/, articles/)"
+    )
+    parser.add_argument(
+        "--output", help="Write the JSON results here instead of stdout"
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="Samples per benchmark")
+    parser.add_argument(
+        "--cards",
+        type=_ints,
+        default=[20, 100, 400],
+        help="Cards per feed page to parse",
+    )
+    parser.add_argument(
+        "--articles", type=_ints, default=[5, 20], help="Articles per scan / scrape"
+    )
+    parser.add_argument(
+        "--feeds", type=_ints, default=[1, 4], help="Feeds scanned at once"
+    )
+    parser.add_argument(
+        "--summarize-articles",
+        type=_ints,
+        default=[1, 8],
+        help="Articles per summarizer batch",
+    )
+    parser.add_argument(
+        "--backends",
+        default="textrank,bart,bart_chunked",
+        help="Summarizer backends to measure",
+    )
+    parser.add_argument(
+        "--scan-backend",
+        default="textrank",
+        help="Summarizer backend used by the scan benchmark",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=5, help="max_articles_in_flight for the bot"
+    )
+    parser.add_argument(
+        "--article-words", type=int, default=600, help="Words per generated article"
+    )
+    parser.add_argument(
+        "--only",
+        help="Comma separated benchmarks to run (parse, extraction, summarize, scrape, scan)",
+    )
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    fixtures = Fixtures(args.fixtures, article_words=args.article_words)
+    only = set(args.only.split(",")) if args.only else None
+    workdir = tempfile.mkdtemp(prefix="news-bench-")
+    cwd = os.getcwd()
+    stand_in = StandIn(fixtures)
+    base_url = await stand_in.start()
+    results = []
+    try:
+        # The bot is chatty; keep stdout for the results
+        with contextlib.redirect_stdout(sys.stderr):
+            mod = load_bot_module(workdir, args)
+            if not only or "parse" in only:
+                results += bench_parse(fixtures, base_url, args.cards, args.repeats)
+            if not only or "extraction" in only:
+                results += bench_extraction(
+                    mod, fixtures, max(args.articles) * args.repeats
+                )
+            if not only or "summarize" in only:
+                results += bench_summarize(
+                    mod,
+                    fixtures,
+                    args.backends.split(","),
+                    args.summarize_articles,
+                    args.repeats,
+                )
+            if not only or "scrape" in only:
+                results += await bench_scrape(
+                    mod, base_url, args.articles, args.repeats
+                )
+            if not only or "scan" in only:
+                results += await bench_scan(
+                    mod, base_url, args.feeds, args.articles, args.repeats
+                )
+    finally:
+        await stand_in.stop()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "time": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "fixtures": "recorded" if fixtures.recorded else "generated",
+            "args": {k: v for k, v in vars(args).items() if k != "output"},
+            "stand_in_requests": stand_in.requests,
+        },
+        "results": results,
+    }
+
+
+def main(argv: list = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return
+
+
+if __name__ == "__main__":
+    main()
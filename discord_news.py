@@ -1,7 +1,15 @@
 import os, sys
-import requests
+import argparse
+import threading
+import copy
+import shutil
+import tempfile
 import lxml
 import time
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
 from dateutil.parser import parse
@@ -14,9 +22,9 @@ from urllib.parse import urlparse
 
 from operator import itemgetter
 
+from collections import OrderedDict
+
 # from tabulate import tabulate
-import pickle
-import json
 
 # Selenium
 from selenium import webdriver
@@ -41,16 +49,58 @@ from discord.ext import commands
 import goose3 as goose
 
 # NLP / Summarizer
-from _summarizer import summarizer
+from _summarizer import summarizer, BATCH_SIZE
+from _summary_pool import SummaryPool
+
+# Staged pipeline a scan's stories flow through
+from _pipeline import Pipeline, Stage
+
+# Posting within Discord's message and rate limits
+from _poster import NewsPoster
+
+# Per-stage timings, served to Prometheus
+from _metrics import Metrics, MetricsServer
+
+# Pooled async HTTP client
+from _fetcher import Fetcher, FetchError
+
+# Pool of headless Chrome instances
+from _browser_pool import BrowserPool
+
+# Persistent cache of scraped / summarized articles
+from _article_cache import ArticleCache
+
+# Persistent index of stories already posted per feed
+from _story_index import StoryIndex
+
+# Near-duplicate headline clustering across feeds
+from _dedup import StoryClusterer
+
+# Headline records parsed from the Google News cards
+from _headlines import parse_headlines
+
+# Article links straight from the Google News cards
+from _links import resolve_link
+
+# Feeds declared in config.json, and the scheduler that scans them
+from _feeds import load_feeds, load_subscriptions, FeedState
+from _scheduler import FeedScheduler
+
+# Scanning without Discord
+from _dry_run import DryRunPoster, ReplayFetcher, load_replay, run_cycles
+
+# Producer / consumer deployments
+from _broker import BrokerServer, BrokerClient
 
 ua = UserAgent()
 g = goose.Goose()
+# goose isn't thread-safe: concurrent extractions come back truncated
+goose_lock = threading.Lock()
 
 # Download appropriate version of Chromedriver from here:
 # https://chromedriver.chromium.org/downloads
 # and place in same directory as this script
 CHROME_PATH = r"./chromedriver.exe"
-service = Service(executable_path=CHROME_PATH)
 
 from webdriver_manager.chrome import ChromeDriverManager
 
@@ -71,18 +121,97 @@ with open("config.json", "r") as jsonfile:
 # print(config)
 
 TOKEN = config["token"]
-US_NEWS_CHANNEL = int(config["us_news_channel_id"])
-WORLD_NEWS_CHANNEL = int(config["world_news_channel_id"])
-US_NEWS_LIMIT = config["us_news_limit"]
-WORLD_NEWS_LIMIT = config["world_news_limit"]
-US_NEWS_POST_TIMER = config["us_news_post_timer"]
-WORLD_NEWS_POST_TIMER = config["world_news_post_timer"]
-
-US_NEWS_LINK = "https://news.google.com/topstories?hl=en-US&gl=US&ceid=US:en"
-WORLD_NEWS_LINK = "https://news.google.com/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRGx1YlY4U0FtVnVHZ0pWVXlnQVAB?hl=en-US&gl=US&ceid=US%3Aen"
+DATA_DIR = "./data"  # Article cache, story index and summary memo
+# "standalone" scans and posts; a "producer" scans and publishes to
+# "consumer"s, which post what they're subscribed to (see _broker.py)
+MODE = config.get("mode", "standalone")
+# Channels are optional here: only standalone bots post to the feeds' own
+# channels, and --mode can override MODE, so parse_args checks them
+FEEDS = load_feeds(config, require_channels=False)
+MAX_CONCURRENT_SCANS = config.get("max_concurrent_scans", 2)
+FEED_START_SPREAD = config.get("feed_start_spread", 60)
+# Back off polling feeds with nothing new, and poll busy feeds more often
+ADAPTIVE_POLLING = config.get("adaptive_polling", True)
+# Local endpoint serving stage timings (set the port to null to disable),
+# and an optional JSONL file every timing is appended to
+METRICS_HOST = config.get("metrics_host", "127.0.0.1")
+METRICS_PORT = config.get("metrics_port", 9108)
+METRICS_TRACE_PATH = config.get("metrics_trace_path", None)
+FETCH_WORKERS = config.get("fetch_workers", 4)
+HTTP_MAX_CONNECTIONS_PER_HOST = config.get("http_max_connections_per_host", 4)
+HTTP_TIMEOUT = config.get("http_timeout", 20)
+HTTP_RETRIES = config.get("http_retries", 3)
+MAX_ARTICLES_IN_FLIGHT = config.get("max_articles_in_flight", 5)
+PIPELINE_QUEUE_SIZE = config.get("pipeline_queue_size", 8)
+# Post each story as soon as it's summarized (editing the scan's message
+# as more are done), instead of posting them all at the end of the scan
+STREAM_POSTS = config.get("stream_posts", False)
+BROWSER_POOL_SIZE = config.get("browser_pool_size", 2)
+BROWSER_MAX_PAGES = config.get("browser_max_pages", 50)
+BROWSER_MAX_RSS_MB = config.get("browser_max_rss_mb", 1024)
+PAGE_LOAD_TIMEOUT = config.get("page_load_timeout", 20)
+ARTICLE_CACHE_TTL = config.get("article_cache_ttl", 2 * 24 * 60 * 60)
+ARTICLE_CACHE_MAX_ENTRIES = config.get("article_cache_max_entries", 2000)
+SEEN_STORY_RETENTION = config.get("seen_story_retention", 7 * 24 * 60 * 60)
+DEDUP_WINDOW = config.get("dedup_window", 6 * 60 * 60)
+DEDUP_THRESHOLD = config.get("dedup_threshold", 0.5)
+WARM_UP_SUMMARIZER = config.get("warm_up_summarizer", True)
+SUMMARIZER_BACKEND = config.get("summarizer_backend", "auto")
+LONG_ARTICLE_WORDS = config.get("long_article_words", 1000)
+SUMMARY_LATENCY_BUDGET = config.get("summary_latency_budget", None)
+LONG_ARTICLE_BACKEND = config.get("long_article_backend", "textrank")
+BART_INFERENCE = config.get("bart_inference", "fp32")
+SUMMARY_MEMO_SIZE = config.get("summary_memo_size", 1024)
+SUMMARY_MEMO_TTL = config.get("summary_memo_ttl", 604800)
+SUMMARY_MEMO_MAX_ENTRIES = config.get("summary_memo_max_entries", 10000)
+# Summarize on worker processes instead of the inference thread (0 to not)
+SUMMARY_WORKERS = config.get("summary_workers", 0)
+SUMMARY_THREADS_PER_WORKER = config.get("summary_threads_per_worker", None)
+SUMMARY_JOB_TIMEOUT = config.get("summary_job_timeout", 300)
+SUMMARY_PIN_CPUS = config.get("summary_pin_cpus", True)
+# Articles with less extracted text than this (in chars) over plain
+# HTTP are re-fetched with Selenium, since they likely need JS to render
+MIN_ARTICLE_LENGTH = config.get("min_article_length", 500)
+BROKER_HOST = config.get("broker_host", "127.0.0.1")
+BROKER_PORT = config.get("broker_port", 9109)
+BROKER_QUEUE_SIZE = config.get("broker_queue_size", 100)
+BROKER_HISTORY = config.get("broker_history", 20)
+# Consumers: feed -> channels to post it to (defaults to each feed's channel)
+SUBSCRIPTIONS = load_subscriptions(config, FEEDS)
+SHARD_ID = config.get("shard_id", None)
+SHARD_COUNT = config.get("shard_count", None)
+CONSUMER_POSTED_SCANS = 50  # Scans a consumer remembers the messages of
+
+summarizer.configure(
+    backend=SUMMARIZER_BACKEND,
+    long_article_words=LONG_ARTICLE_WORDS,
+    latency_budget=SUMMARY_LATENCY_BUDGET,
+    long_article_backend=LONG_ARTICLE_BACKEND,
+    bart_inference=BART_INFERENCE,
+    memo_size=SUMMARY_MEMO_SIZE,
+    memo_ttl=SUMMARY_MEMO_TTL,
+    memo_max_entries=SUMMARY_MEMO_MAX_ENTRIES,
+)
+
+# Fallback search for headlines whose card link doesn't resolve
+GOOGLE_SEARCH_URL = "https://www.google.com/search?q="
+GOOGLE_SEARCH_DELAY = 3  # Seconds to wait before each search
+
+# Everything that blocks (Selenium, BeautifulSoup) runs on a bounded
+# thread pool, and goose extraction and model inference each run on their
+# own single worker, so the event loop only coordinates and the gateway
+# heartbeat never stalls.
+fetch_executor = ThreadPoolExecutor(
+    max_workers=FETCH_WORKERS, thread_name_prefix="news-fetch"
+)
+extract_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="news-extract")
+inference_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="news-inference"
+)
 
 intents = discord.Intents.default()
-client = discord.Client(intents=intents)
+client = discord.Client(intents=intents, shard_id=SHARD_ID, shard_count=SHARD_COUNT)
+consumer = None  # NewsConsumer, in consumer mode
 # client = commands.Bot(command_prefix = '!!')
 
 
@@ -97,332 +226,631 @@ def driver_interceptor(request: dict) -> None:
     request.headers["User-Agent"] = ua.random
 
 
-class NewsBot:
+def make_driver() -> webdriver.Chrome:
     """
-    Discord bot that scrapes Google News and posts
-    summaries to Discord channels defined in config.json.
+    Creates a headless Chrome driver. Called by the browser
+    pool whenever it needs a new (or recycled) instance.
+
+    Returns:
+        webdriver.Chrome: Selenium Chrome driver
+    """
+    # WebdriverManager library automates the process of getting Chromedriver, but it'll
+    # be faster initialization if you do download it manually and place it in the dir
+    # Wasn't able to get the webdriver-manager library working properly with the Discord
+    # task looping, so we'll manually download the driver and place it in the dir
+
+    # driver = webdriver.Chrome(
+    #     service=ChromeService(ChromeDriverManager().install()),
+    #     options=chrome_options,
+    # )
+
+    if CHROME_PATH:
+        # Each driver needs its own service, since the service owns the process
+        service = Service(executable_path=CHROME_PATH)
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+    else:
+        # If we didn't provide a chrome path it will look for chromedriver in PATH
+        driver = webdriver.Chrome(options=chrome_options)
+    # Make Selenium wait 3 seconds before extracting contents
+    driver.implicitly_wait(3)
+    # Intercept requests and modify headers
+    driver.request_interceptor = driver_interceptor
+    return driver
+
+
+async def run_blocking(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    """
+    Runs a blocking callable on an executor and awaits its result
+    without blocking the event loop.
+
+    Args:
+        executor (ThreadPoolExecutor): Executor to run the callable on
+        func (callable): Blocking function to call
 
-    Results are cached in pickle files locally to avoid
-    redundant posts (though some headlines can be repeated
-    still).
+    Returns:
+        Any: Return value of the callable
     """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(func, *args, **kwargs)
+    )
 
-    def __init__(self) -> None:
-        self._first_time_running_us_news = True
-        self._first_time_running_world_news = True
 
-        # WebdriverManager library automates the process of getting Chromedriver, but it'll
-        # be faster initialization if you do download it manually and place it in the dir
-        # Wasn't able to get the webdriver-manager library working properly with the Discord
-        # task looping, so we'll manually download the driver and place it in the dir
+class NewsBot:
+    """
+    Discord bot that scrapes Google News and posts
+    summaries to Discord channels defined in config.json.
 
-        # self.driver = webdriver.Chrome(
-        #     service=ChromeService(ChromeDriverManager().install()),
-        #     options=chrome_options,
-        # )
+    Stories already posted are tracked in a persistent index,
+    so each scan only processes and posts new stories. Scraped
+    articles and their summaries are cached in SQLite, so
+    repeated stories are never re-processed.
+    """
 
+    def __init__(
+        self,
+        data_dir: str = DATA_DIR,
+        feeds: list = None,
+        broker: BrokerServer = None,
+        max_articles_in_flight: int = MAX_ARTICLES_IN_FLIGHT,
+        max_concurrent_scans: int = MAX_CONCURRENT_SCANS,
+        summary_workers: int = SUMMARY_WORKERS,
+    ) -> None:
+        """
+        Args:
+            data_dir (str, optional): Directory of the article cache and
+                story index. Defaults to DATA_DIR.
+            feeds (list, optional): Feeds to scan. Defaults to FEEDS.
+            broker (BrokerServer, optional): Publish stories to consumers
+                through this broker, instead of posting them to Discord
+            max_articles_in_flight (int, optional): Max articles scraped
+                at once, across all scans. Defaults to MAX_ARTICLES_IN_FLIGHT.
+            max_concurrent_scans (int, optional): Max feeds scanned at
+                once. Defaults to MAX_CONCURRENT_SCANS.
+            summary_workers (int, optional): Summarizer worker processes,
+                or 0 to summarize in this process. Defaults to SUMMARY_WORKERS.
+        """
         # Create cache / data directory if it does not exist
-        if not os.path.exists("./data"):
-            os.makedirs("./data")
-
-        if CHROME_PATH:
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-        else:
-            # If we didn't provide a chrome path it will look for chromedriver in PATH
-            self.driver = webdriver.Chrome(options=chrome_options)
-        # print(self.driver)
-        # Make Selenium wait 3 seconds before extracting contents
-        self.driver.implicitly_wait(3)
-        # Intercept requests and modify headers
-        self.driver.request_interceptor = driver_interceptor
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+        self.feeds = FEEDS if feeds is None else feeds
+        # Timings of every stage of every scan
+        self.metrics = Metrics(trace_path=METRICS_TRACE_PATH)
+        self.metrics_server = None
+        if METRICS_PORT:
+            self.metrics_server = MetricsServer(
+                self.metrics, host=METRICS_HOST, port=METRICS_PORT
+            )
+        # Max number of articles being scraped at once, across all scans
+        self.max_articles_in_flight = max_articles_in_flight
+        self._article_semaphore = asyncio.Semaphore(max_articles_in_flight)
+        # Google searches are made one at a time, each after a delay
+        self._google_lock = asyncio.Lock()
+        # One pooled HTTP client for every page we download
+        self.fetcher = Fetcher(
+            max_connections_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+            timeout=HTTP_TIMEOUT,
+            retries=HTTP_RETRIES,
+        )
+        # Warm Chrome instances, leased per article and recycled after
+        # too many pages or too much memory. Chrome is only started
+        # once an article actually needs it.
+        self.browser_pool = BrowserPool(
+            make_driver,
+            fetch_executor,
+            size=BROWSER_POOL_SIZE,
+            max_pages=BROWSER_MAX_PAGES,
+            max_rss_mb=BROWSER_MAX_RSS_MB,
+            page_load_timeout=PAGE_LOAD_TIMEOUT,
+        )
+        # Articles we've already scraped / summarized, by URL and title
+        self.article_cache = ArticleCache(
+            path=os.path.join(data_dir, "article_cache.sqlite"),
+            ttl=ARTICLE_CACHE_TTL,
+            max_entries=ARTICLE_CACHE_MAX_ENTRIES,
+        )
+        # Stories each feed has already posted, kept across restarts
+        self.story_index = StoryIndex(
+            path=os.path.join(data_dir, "seen_stories.sqlite"),
+            retention=SEEN_STORY_RETENTION,
+        )
+        # Near-duplicate headlines across all feeds share one scrape
+        self.clusterer = StoryClusterer(window=DEDUP_WINDOW, threshold=DEDUP_THRESHOLD)
+        self._cluster_scrapes = {}  # Cluster id -> task scraping the story
+        self._cluster_feeds = {}  # Cluster id -> feeds sharing its scrape
+        # Worker processes summarizing in parallel, if configured
+        self.summary_pool = None
+        if summary_workers:
+            self.summary_pool = SummaryPool(
+                summarizer,
+                workers=summary_workers,
+                threads_per_worker=SUMMARY_THREADS_PER_WORKER,
+                timeout=SUMMARY_JOB_TIMEOUT,
+                pin_cpus=SUMMARY_PIN_CPUS,
+                warm_up=WARM_UP_SUMMARIZER,
+            )
+        # Packs stories into messages and posts / edits them
+        self.poster = NewsPoster(client)
+        self.broker = broker
+        # Validators / fingerprints of each feed's last page
+        self.feed_states = {feed.name: FeedState() for feed in self.feeds}
+        # Every feed shares the pipeline above; the scheduler only
+        # decides when each one is scanned
+        self.scheduler = FeedScheduler(
+            self.scan_feed,
+            self.feeds,
+            max_concurrent_scans=max_concurrent_scans,
+            start_spread=FEED_START_SPREAD,
+            adaptive=ADAPTIVE_POLLING,
+        )
         return
 
-    async def scan_us_news(self, url: str = US_NEWS_LINK) -> list:
+    async def scan_feed(self, feed) -> list:
         """
-        Scrape Google News for US news headlines, then searches the headline
-        in Google to get the article page and scrape that content. The content
-        of the article is then summarized and collected in a list of results,
-        which is posted to Discord.
+        Scrape a feed's Google News page for headlines, then gets the article
+        page of each new headline and scrape that content. The content of
+        the article is then summarized and collected in a list of results,
+        which is posted to the feed's Discord channel.
+
+        The page is fetched conditionally, and skipped without parsing if
+        it's unchanged (304, or an identical body), or without diffing if
+        its headlines are the same as last time.
 
         Args:
-            url (str, optional): URL to scrape for news; defaults to US_NEWS_LINK.
+            feed (Feed): Feed to scan
 
         Returns:
-            list: List of US news results with date, title, and article summary.
-        """
-        r = requests.get(url, headers={"User-Agent": ua.random})
-        soup = BeautifulSoup(r.text, "lxml", from_encoding="utf-8")
-        # newscards = soup.find_all("div", {"class": "KDoq1"})
-        headlines = soup.find_all("h4", {"class": "iTin5e"})
-        dates = soup.find_all("time", {"class": "hvbAAd"})
-        # print(len(headlines), 'headlines', len(dates), 'dates found.')
-        # newscards = newscards[: US_NEWS_LIMIT]
-        headlines = headlines[:US_NEWS_LIMIT]
-        dates = dates[:US_NEWS_LIMIT]
-
-        results = []
-        pickle_cache = []
-        # Gather results and check cache
-        for i, (date, title) in enumerate(zip(dates, headlines)):
-            results.append([date.text, title.text])
-        # Filter results for unique values by title and date
-        results = [list(x) for x in set(tuple(x) for x in results)]
-        if os.path.isfile("./data/cache_us_news.pkl"):
-            same = True
-            with open("./data/cache_us_news.pkl", "rb") as file:
-                pickle_cache = pickle.load(open("./data/cache_us_news.pkl", "rb"))
-                same = self._check_pickle_cache_with_results(pickle_cache, results)
-            if same:
-                print("No new US news to update.")
+            list: List of news results with date, title, and article summary.
+        """
+        with self.metrics.timer("scan", feed=feed.name) as scan:
+            state = self.feed_states[feed.name]
+            headers = {"User-Agent": ua.random}
+            headers.update(state.request_headers())
+            with self.metrics.timer(
+                "headline_fetch", feed=feed.name, url=feed.url
+            ) as record:
+                r = await self.fetcher.get(feed.url, headers=headers)
+                record["status"] = r.status
+            if r.status >= 400:
+                print("Err fetching " + feed.name + " news page: HTTP", r.status)
+                scan["outcome"] = "error"
                 return
-            else:
-                with open("./data/cache_us_news.pkl", "wb") as file:
-                    pickle.dump(results, file)
-                results = await self.scrape_news_links(results)
-                results = await self.summarize_news(results)
-                await self.post_us_news(results)
+            if state.page_unchanged(r):
+                print("No changes to " + feed.name + " news page.")
+                scan["outcome"] = "unchanged"
                 return
-        else:
-            # print("Caching new results to pickle file.")
-            with open("./data/cache_us_news.pkl", "wb") as file:
-                pickle.dump(results, file)
-            results = await self.scrape_news_links(results)
-            results = await self.summarize_news(results)
-            await self.post_us_news(results)
-        print(results)
-        return results
-
-    async def scan_world_news(self, url: str = WORLD_NEWS_LINK) -> list:
+            with self.metrics.timer("headline_parse", feed=feed.name):
+                headlines = await run_blocking(
+                    fetch_executor, parse_headlines, r.text, feed
+                )
+            if state.headlines_unchanged(headlines):
+                print("No changes to " + feed.name + " news headlines.")
+                state.remember(r, headlines)
+                scan["outcome"] = "unchanged"
+                return
+            # Check which stories are new
+            results = self.story_index.diff(feed.name, headlines)
+            if not results:
+                print("No new " + feed.name + " news to update.")
+                state.remember(r, headlines)
+                scan["outcome"] = "no_new"
+                return
+            new = results
+            results = await self.process_news(feed, new)
+            # Only skip this page next time once all of its new stories
+            # are posted; until then, the ones that failed are retried
+            if len(results) == len(new):
+                state.remember(r, headlines)
+            scan["stories"] = len(results)
+            return results
+
+    async def process_news(self, feed, headlines: list) -> list:
         """
-        Scrape Google News for world news headlines, then searches the headline
-        in Google to get the article page and scrape that content. The content
-        of the article is then summarized and collected in a list of results,
-        which is posted to Discord.
+        Runs a scan's new headlines through the pipeline: fetch (find
+        the article link), extract (scrape the article), summarize and
+        post. The stages overlap, each with its own concurrency, so a
+        story is summarized as soon as its article is scraped, rather
+        than after the slowest article of the scan.
+
+        With STREAM_POSTS, each story is posted as soon as it's
+        summarized, by editing the scan's message to add it; otherwise
+        all stories are posted together once the scan is done.
 
         Args:
-            url (str, optional): URL to scrape for news; defaults to WORLD_NEWS_LINK.
+            feed (Feed): Feed the headlines came from
+            headlines (list): New Headline records (date, title, link, source)
 
         Returns:
-            list: List of US news results with date, title, and article summary.
+            list: Date, title, link, article summary, the tier that
+                served the article and the source of each posted story,
+                in the order of the page
         """
-        r = requests.get(url)
-        soup = BeautifulSoup(r.text, "lxml")
+        stories = {}  # Index on the page -> finished story
+        messages = None
+
+        async def post(item: tuple) -> tuple:
+            nonlocal messages
+            i, story = item
+            if STREAM_POSTS:
+                # Only counted once it's posted, so a story whose post
+                # failed isn't in the results and is retried next scan
+                posted = dict(stories)
+                posted[i] = story
+                ordered = [posted[k] for k in sorted(posted)]
+                messages = await self.post_news(feed, ordered, messages=messages)
+                self.story_index.mark_seen(feed.name, [story])
+            stories[i] = story
+            return item
+
+        pipeline = Pipeline(
+            [
+                Stage(
+                    "fetch",
+                    functools.partial(self._fetch_story, feed.name),
+                    workers=self.max_articles_in_flight,
+                ),
+                Stage(
+                    "extract",
+                    functools.partial(self._extract_story, feed.name),
+                    workers=self.max_articles_in_flight,
+                ),
+                Stage(
+                    "summarize",
+                    functools.partial(self._summarize_stories, feed.name),
+                    batch_size=BATCH_SIZE,
+                ),
+                Stage("post", post),
+            ],
+            queue_size=PIPELINE_QUEUE_SIZE,
+        )
+        await pipeline.run(enumerate(headlines))
+        results = [stories[k] for k in sorted(stories)]
+        print("Finished scan: ", len(results), "of", len(headlines), "stories.")
+        if results and not STREAM_POSTS:
+            await self.post_news(feed, results)
+            self.story_index.mark_seen(feed.name, results)
+        return results
 
-        # newscards = soup.find_all("div", {"class": "NWHX8c"})
-        headlines = soup.find_all("h4", {"class": "gPFEn"})
-        dates = soup.find_all("time", {"class": "hvbAAd"})
-        print(len(headlines), "headlines", len(dates), "dates found for world news.")
-        # newscards = newscards[: WORLD_NEWS_LIMIT]
-        headlines = headlines[:WORLD_NEWS_LIMIT]
-        dates = dates[:WORLD_NEWS_LIMIT]
+    async def _fetch_story(self, feed: str, item: tuple) -> tuple:
+        """
+        Fetch stage: finds the article of a headline, from the article
+        cache if we've seen it before, or else from the link on its card
+        (or a Google search if the card's link doesn't resolve).
 
-        pickle_cache = []
-        results = []
+        Near-duplicate headlines (across feeds, within the dedup window)
+        share one scrape: the first one scrapes the story, and the rest
+        wait for and reuse its result. A near-duplicate of a story its own
+        feed already has is dropped (and marked seen), so the same article
+        isn't posted twice in a feed.
 
-        # Gather results and check cache
-        for i, (date, title) in enumerate(zip(dates, headlines)):
-            results.append([date.text, title.text])
-        # Filter results for unique values by title and date
-        results = [list(x) for x in set(tuple(x) for x in results)]
-        if os.path.isfile("./data/cache_world_news.pkl"):
-            same = True
-            with open("./data/cache_world_news.pkl", "rb") as file:
-                pickle_cache = pickle.load(open("./data/cache_world_news.pkl", "rb"))
-                same = self._check_pickle_cache_with_results(pickle_cache, results)
-            if same:
-                print("No new world news to update.")
-                return
-            else:
-                with open("./data/cache_world_news.pkl", "wb") as file:
-                    pickle.dump(results, file)
-                results = await self.scrape_news_links(results)
-                results = await self.summarize_news(results)
-                await self.post_world_news(results)
-        else:
-            print("Caching new results to pickle file.")
-            with open("./data/cache_world_news.pkl", "wb") as file:
-                pickle.dump(results, file)
-                results = await self.scrape_news_links(results)
-                results = await self.summarize_news(results)
-                await self.post_world_news(results)
-        print(results)
-        return results
+        Args:
+            feed (str): Name of the feed (for metrics)
+            item (tuple): Index of the headline in the scan, and the headline
+                (date, title, card link, source)
 
-    async def scrape_news_links(self, news_list: list) -> list:
+        Returns:
+            tuple: Index, the story (date, title, link, article contents,
+                tier, source) and the future to resolve once its article
+                is scraped (None if the contents are already known), or
+                None on failure
         """
-        Scrape the links of the results from Google News
-        with Selenium, and makes summaries of the news contents.
+        i, headline = item
+        date, title, card_link, source = headline
+        cluster = self.clusterer.assign(title)
+        for cid in list(self._cluster_scrapes):
+            if not self.clusterer.is_active(cid):
+                del self._cluster_scrapes[cid]
+                self._cluster_feeds.pop(cid, None)
+        shared = self._cluster_scrapes.get(cluster)
+        if shared is not None and not (shared.done() and shared.result() is None):
+            feeds = self._cluster_feeds.setdefault(cluster, set())
+            if feed in feeds:
+                print("Skipping near-duplicate in " + feed + " news: ", i, date, title)
+                self.story_index.mark_seen(feed, [headline])
+                return None
+            feeds.add(feed)
+            print("Scrape (near-duplicate, shared): ", i, date, title)
+            # Shielded, so a cancelled scan doesn't cancel a scrape others share
+            scraped = await asyncio.shield(shared)
+            if scraped is None:
+                return None
+            link, body, tier = scraped
+            self.article_cache.add_title(title, link)
+            return i, [date, title, link, body, tier, source], None
+        scrape = asyncio.get_running_loop().create_future()
+        self._cluster_scrapes[cluster] = scrape
+        self._cluster_feeds[cluster] = {feed}
+        handed_off = False  # The extract stage resolves the future from here
+        try:
+            cached = self.article_cache.get_by_title(title)
+            if cached is not None:
+                print("Scrape (cached): ", i, date, title, cached["link"])
+                link, body, tier = cached["link"], cached["body"], cached["tier"]
+                scrape.set_result((link, body, tier))
+                return i, [date, title, link, body, tier, source], None
+            async with self._article_semaphore:
+                link = None
+                if card_link:
+                    with self.metrics.timer(
+                        "link_resolution", feed=feed, tier="card", url=card_link
+                    ) as record:
+                        link = await resolve_link(self.fetcher, card_link)
+                        if not link:
+                            record["outcome"] = "unresolved"
+                if not link:
+                    # Google the title of the news article to get the link and scrape that
+                    with self.metrics.timer(
+                        "link_resolution", feed=feed, tier="search"
+                    ) as record:
+                        link = await self.google(title + " news")
+                        record["url"] = link
+                        if not link:
+                            record["outcome"] = "unresolved"
+            if not link:
+                print("Err finding the article for " + title + ", skipping it.")
+                return None
+            print("Scrape: ", i, date, title, link)
+            cached = self.article_cache.get_by_url(link)
+            if cached is not None:
+                # Same article as a headline we've seen under another title
+                self.article_cache.add_title(title, link)
+                scrape.set_result((link, cached["body"], cached["tier"]))
+                return (
+                    i,
+                    [date, title, link, cached["body"], cached["tier"], source],
+                    None,
+                )
+            handed_off = True
+            return i, [date, title, link, None, None, source], scrape
+        except Exception as e:
+            print("Err getting scrape for " + title + ": ", e)
+            return None
+        finally:
+            # Never leave near-duplicates waiting on a scrape that won't happen
+            if not scrape.done() and not handed_off:
+                scrape.set_result(None)
+
+    async def _extract_story(self, feed: str, item: tuple) -> tuple:
+        """
+        Extract stage: scrapes the article of a story whose contents
+        aren't known yet. Failures are isolated to the story, so one
+        broken article doesn't affect the rest of the scan.
 
         Args:
-            news_list (list): List of results from Google News scrape
+            feed (str): Name of the feed (for metrics)
+            item (tuple): Index, story and scrape future from the fetch stage
 
         Returns:
-            list: List of same results with scraped contents appended
+            tuple: Index and the story with its article contents and
+                tier, or None on failure
         """
-        results = []
+        i, story, scrape = item
+        if scrape is None:
+            return i, story
+        title, link = story[1], story[2]
+        try:
+            async with self._article_semaphore:
+                body, tier = await self.extract_article(link, feed=feed)
+            self.article_cache.put(title, link, body, tier)
+            print("Scraped with " + tier + ": ", i, title, len(body), "chars")
+            story[3], story[4] = body, tier
+            scrape.set_result((link, body, tier))
+            return i, story
+        except Exception as e:
+            print("Err getting scrape for " + title + ": ", e)
+            return None
+        finally:
+            if not scrape.done():
+                scrape.set_result(None)
+
+    async def extract_article(self, link: str, feed: str = "") -> tuple:
+        """
+        Gets the contents of an article with a tiered fetcher. Most news
+        sites serve the article in static HTML, so we first try a plain
+        HTTP GET, and only load the page in Selenium if that gives us
+        no (or too little) text.
 
-        for i, each in enumerate(news_list):
-            date = each[0]
-            title = each[1]
-            try:
-                # Google the title of the news article to get the link and scrape that
-                link = self.google(title + " news")
-                print("Scrape: ", i, date, title, link)
-                self.driver.implicitly_wait(3)
-                # # Intercept requests and modify headers
-                self.driver.request_interceptor = driver_interceptor
-                # wait = WebDriverWait(self.driver, 3)
-                self.driver.get(link)
-                body = self.driver.find_element(By.TAG_NAME, "body")
-                body = body.get_attribute("innerHTML")
-                body = g.extract(raw_html=body)
-                body = body.cleaned_text
-                print("Cleaned text extracting from goose: ", body)
-                # self.driver.close()
-                results.append([date, title, link, body])
-            except Exception as e:
-                # self.driver.close()
-                print("Err getting scrape for " + title + ": ", e)
-                pass
-        print("Finished scrape: ", len(results))
-        return results
+        Args:
+            link (str): Link of the article
+            feed (str, optional): Name of the feed (for metrics)
 
-    async def summarize_news(self, news_list: list) -> list:
+        Returns:
+            tuple: Cleaned article text, and the tier that served it
+                ("http" or "selenium")
         """
-        Summarizes the news contents of a list of results.
+        try:
+            with self.metrics.timer(
+                "page_load", feed=feed, tier="http", url=link
+            ) as record:
+                r = await self.fetcher.get(link, headers={"User-Agent": ua.random})
+                if r.status != 200:
+                    record["outcome"] = "http_" + str(r.status)
+            if r.status == 200:
+                body = await self._timed_extract(r.text, feed, "http", link)
+                if len(body) >= MIN_ARTICLE_LENGTH:
+                    return body, "http"
+        except FetchError as e:
+            print("Err fetching " + link + " over HTTP, using Selenium: ", e)
+        async with self.browser_pool.lease() as driver:
+            with self.metrics.timer("page_load", feed=feed, tier="selenium", url=link):
+                html = await run_blocking(
+                    fetch_executor, self._load_article, driver, link
+                )
+        body = await self._timed_extract(html, feed, "selenium", link)
+        return body, "selenium"
+
+    async def _timed_extract(self, html: str, feed: str, tier: str, link: str) -> str:
+        """
+        Extracts the article text from raw HTML on the extraction
+        executor, timing it as the extraction stage.
 
         Args:
-            news_list (list): List of results from Google News scrape
+            html (str): Raw HTML of the article page
+            feed (str): Name of the feed
+            tier (str): Tier that loaded the page
+            link (str): Link of the article
 
         Returns:
-            list: List of same results with summaries appended
+            str: Cleaned article text
         """
-        results = []
-        print("Summarizing: ", len(news_list), "articles.")
-        for i, each in enumerate(news_list):
-            print("Summarize: ", i, each)
-            date = each[0]
-            title = each[1]
-            link = each[2]
-            body = each[3]
-            article_summary = ""
-            # print("Summarizing: ", i, date, title, link)
-            article_summary = summarizer.summarize(body)
-            print("Finished summary: ", article_summary)
-            results.append([date, title, link, article_summary])
-        return results
+        with self.metrics.timer("extraction", feed=feed, tier=tier, url=link) as record:
+            body = await run_blocking(extract_executor, self._extract_text, html)
+            record["chars"] = len(body)
+        return body
 
-    async def post_us_news(self, data: list, channel_id: int = US_NEWS_CHANNEL) -> None:
+    def _extract_text(self, html: str) -> str:
         """
-        Formats and posts a list of US news results to
-        Discord channel defined in config.json.
+        Extracts the article text from raw HTML with goose, one
+        extraction at a time.
 
         Args:
-            data (list): List of US news results
-        """
-        title = ""
-        descr = ""
-        # descr += "------------------------------------------------------"
-        for i, each in enumerate(data):
-            descr += "--------------------------------------------------------\n"
-            descr += "**" + data[i][1] + "**" + "\n" + "*" + data[i][0] + "*" + "\n"
-            # descr += "\n------------------------------\n"
-            descr += data[i][2].replace("www.", "") + "\n\n"
-            descr += data[i][3] + "\n"
-        # Ensure descr is under 4096 chars for Discord form submission
-        descr = descr[:4096]
-        now = time.time()
-        ts = datetime.fromtimestamp(now).strftime("%m/%d/%Y, %H:%M:%S")
-        message = "**🇺🇸 📰  LATEST US NEWS STORIES  📰 🇺🇸**\t*(" + str(ts) + ")*"
-
-        news_embed = discord.Embed(title=title, description=descr)
+            html (str): Raw HTML of the article page
 
-        print("Posting: ", message)
+        Returns:
+            str: Cleaned article text
+        """
+        with goose_lock:
+            return g.extract(raw_html=html).cleaned_text
 
-        # await client.wait_until_ready()
+    def _load_article(self, driver: webdriver.Chrome, link: str) -> str:
+        """
+        Loads an article page in Selenium and gets its rendered HTML.
+        This blocks, so it's meant to be run on the fetch executor.
 
-        channel = client.get_channel(channel_id)
+        Args:
+            driver (webdriver.Chrome): Driver leased from the browser pool
+            link (str): Link of the article
 
-        await channel.send(message, embed=news_embed)
-        print("Posted update to US news.")
-        return
+        Returns:
+            str: Rendered HTML of the page's body
+        """
+        # wait = WebDriverWait(driver, 3)
+        driver.get(link)
+        body = driver.find_element(By.TAG_NAME, "body")
+        return body.get_attribute("innerHTML")
 
-    async def post_world_news(
-        self, data: list, channel_id: int = WORLD_NEWS_CHANNEL
-    ) -> None:
+    async def _summarize_stories(self, feed: str, items: list) -> list:
         """
-        Formats and posts a list of world news results to
-        Discord channel defined in config.json.
+        Summarize stage: summarizes the stories that are ready together,
+        so articles finishing close together still share a model batch.
 
         Args:
-            data (list): _description_
-        """
-        title = ""
-        descr = ""
-        # descr += "------------------------------------------------------"
+            feed (str): Name of the feed (for metrics)
+            items (list): Index and story of each article to summarize
 
-        for i, each in enumerate(data):
-            descr += "--------------------------------------------------------\n"
-            descr += "**" + data[i][1] + "**" + "\n" + "*" + data[i][0] + "*" + "\n"
-            # descr += "\n------------------------------\n"
-            descr += data[i][2].replace("www.", "") + "\n\n"
-            descr += data[i][3] + "\n"
-        # Ensure descr is under 4096 chars for Discord form submission
-        descr = descr[:4096]
-        now = time.time()
-        ts = datetime.fromtimestamp(now).strftime("%m/%d/%Y, %H:%M:%S")
-        message = "**🌎 📰  LATEST WORLD NEWS STORIES  📰 🌎**\t*(" + str(ts) + ")*"
+        Returns:
+            list: Index and story, with its summary instead of its contents
+        """
+        summarized = await self.summarize_news([story for _, story in items], feed=feed)
+        return [(i, story) for (i, _), story in zip(items, summarized)]
 
-        news_embed = discord.Embed(title=title, description=descr)
+    async def summarize_news(self, news_list: list, feed: str = "") -> list:
+        """
+        Summarizes the news contents of a list of results.
 
-        print("Posting: ", message)
-        # await client.wait_until_ready()
+        Args:
+            news_list (list): List of results from Google News scrape
+            feed (str, optional): Name of the feed (for metrics)
 
-        channel = client.get_channel(channel_id)
+        Returns:
+            list: List of same results with summaries appended
+        """
+        print("Summarizing: ", len(news_list), "articles.")
+        summaries = {}
+        to_summarize = []
+        for i, each in enumerate(news_list):
+            cached = self.article_cache.get_by_url(each[2])
+            if cached is not None and cached["summary"]:
+                summaries[i] = cached["summary"]
+                self.metrics.observe(
+                    "summarization", 0, feed=feed, outcome="cached", url=each[2]
+                )
+            else:
+                to_summarize.append(i)
+        # Articles that aren't cached are summarized together in batches
+        if to_summarize:
+            texts = [news_list[i][3] for i in to_summarize]
+            started = time.perf_counter()
+            try:
+                if self.summary_pool is not None:
+                    batch = await self.summary_pool.summarize_batch(texts)
+                else:
+                    batch = await run_blocking(
+                        inference_executor, summarizer.summarize_batch, texts
+                    )
+                outcome = "ok"
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                # The whole batch's time counts for each of its articles
+                seconds = time.perf_counter() - started
+                for i, text in zip(to_summarize, texts):
+                    self.metrics.observe(
+                        "summarization",
+                        seconds,
+                        feed=feed,
+                        tier=summarizer.choose_backend(text),
+                        outcome=outcome,
+                        url=news_list[i][2],
+                        batch=len(texts),
+                    )
+            for i, article_summary in zip(to_summarize, batch):
+                summaries[i] = article_summary
+                self.article_cache.set_summary(news_list[i][2], article_summary)
 
-        await channel.send(message, embed=news_embed)
-        print("Posted update to world news.")
-        return
+        results = []
+        for i, each in enumerate(news_list):
+            date = each[0]
+            title = each[1]
+            link = each[2]
+            article_summary = summaries[i]
+            print("Finished summary: ", i, title, len(article_summary), "chars")
+            # Keep any extra fields (like the scrape tier) after the summary
+            results.append([date, title, link, article_summary] + each[4:])
+        return results
 
-    def _check_pickle_cache_with_results(
-        self, pickle_cache: list, results: list
-    ) -> bool:
+    async def post_news(self, feed, data: list, messages: list = None) -> list:
         """
-        Check if the pickle data is the same as the results.
-
-        It checks for all items, and if it detects any difference
-        at all, it returns False.
+        Formats and posts a list of news results to the feed's
+        Discord channel.
 
         Args:
-            pickle_data (list): List of results read from pickle file
-            results (list): List of results from Google News scrape
+            feed (Feed): Feed the results came from
+            data (list): List of news results
+            messages (list, optional): Messages posted earlier in the scan,
+                edited to show the results instead of posting anew
 
         Returns:
-            bool: True if same, False if different
-        """
-        same = True
-        for x, y in zip(pickle_cache, results):
-            if x is y:
-                pass
-            elif type(x == list) and (type(y) == list):
-                # We only need to check for one item,
-                # being the title, since the date / time
-                # will probably be different on each scrape
-                # print(x, y, len(x), len(y))
-                for i in range(1, 2):
-                    if x[i] == y[i]:
-                        pass
-                    else:
-                        same = False
+            list: Posted (or edited) messages
+        """
+        if messages:
+            # Edits keep the time of the scan's first post
+            ts = messages[0].created_at.astimezone()
+        else:
+            ts = datetime.now()
+        ts = ts.strftime("%m/%d/%Y, %H:%M:%S")
+        heading = "**" + feed.heading + "**\t*(" + ts + ")*"
+        print("Posting: ", heading, len(data), "stories")
+        with self.metrics.timer(
+            "post", feed=feed.name, stories=len(data), edit=bool(messages)
+        ):
+            if self.broker is not None:
+                messages = await self.broker.publish(
+                    feed.name, heading, data, messages=messages
+                )
             else:
-                same = False
-        return same
+                messages = await self.poster.post(
+                    feed.channel_id, heading, data, messages=messages
+                )
+        print("Posted update to " + feed.name + " news.")
+        return messages
 
-    def google(self, query: str) -> str:
+    async def google(self, query: str) -> str:
         """
         Google search for a query string and return the
-        first result link. We will use this to get the
-        news article from a headline as the query.
+        first result link. Only used to find the news article
+        for a headline whose card link couldn't be resolved.
 
         Args:
             query (str): Query string
@@ -430,9 +858,6 @@ class NewsBot:
         Returns:
             str: First result link
         """
-        # Wait 3 seconds before we make a Google request
-        # to avoid getting blocked
-        time.sleep(3)
         headers = {
             "User-Agent": ua.random,
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -443,9 +868,14 @@ class NewsBot:
             "Upgrade-Insecure-Requests": "1",
         }
         query = "+".join(query.split())
-        url = "https://www.google.com/search?q=" + query
-        r = requests.get(url, headers=headers)
-        soup = BeautifulSoup(r.text, "html.parser")
+        url = GOOGLE_SEARCH_URL + query
+        # Wait a few seconds before we make a Google request to avoid
+        # getting blocked. Searches from concurrent scrapes queue up here,
+        # so they're spaced out instead of all waiting and firing together.
+        async with self._google_lock:
+            await asyncio.sleep(GOOGLE_SEARCH_DELAY)
+            r = await self.fetcher.get(url, headers=headers)
+        soup = await run_blocking(fetch_executor, BeautifulSoup, r.text, "html.parser")
         links = soup.find_all("div", "yuRUbf")
         link = ""  # Result to return
         for l in links:
@@ -459,50 +889,134 @@ class NewsBot:
         print("Link found from Google for query: ", query, link)
         return link
 
-    @tasks.loop(seconds=US_NEWS_POST_TIMER)
-    async def scan_us_news_loop(self):
+    def warm_up(self) -> None:
         """
-        Scan Google News for US news, and summarize and
-        post to Discord.
+        Loads the summarizer's models in the background, so the first
+        scan doesn't pay for it. Does nothing unless WARM_UP_SUMMARIZER.
         """
-        if self._first_time_running_us_news:
-            print("Initializing US news summarization loop.")
-            self._first_time_running_us_news = False
-            # Add any logic you want on first initialization of loop
-            await self.scan_us_news()
-            return
-        else:
-            print("Scanning US news.")
-            await self.scan_us_news()
-            return
+        if self.summary_pool is not None:
+            # Workers load their models as they start (with WARM_UP_SUMMARIZER)
+            self.summary_pool.start()
+        elif WARM_UP_SUMMARIZER:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(inference_executor, summarizer.warm_up)
+        return
 
-    @tasks.loop(seconds=WORLD_NEWS_POST_TIMER)
-    async def scan_world_news_loop(self) -> None:
+    def start_scanning(self) -> None:
         """
-        Scan Google News for world news, and summarize and
-        post to Discord.
+        Starts scanning every feed on its interval. Safe to call again
+        (on_ready fires on every reconnect); feeds already being
+        scanned aren't restarted.
         """
-        if self._first_time_running_world_news:
-            print("Initializing world news summarization loop.")
-            self._first_time_running_world_news = False
-            # Add any logic you want on first initialization of loop
-            await self.scan_world_news()
-            return
-        else:
-            print("Scanning world news.")
-            await self.scan_world_news()
-            return
+        self.scheduler.start()
+        return
+
+    async def close(self) -> None:
+        """
+        Stops scanning and releases the bot's resources (HTTP
+        connections, Chrome, caches).
+        """
+        await self.scheduler.stop()
+        if self.broker is not None:
+            await self.broker.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.fetcher.close()
+        await self.browser_pool.close()
+        if self.summary_pool is not None:
+            await self.summary_pool.close()
+        self.article_cache.close()
+        self.story_index.close()
+        self.metrics.close()
+        return
+
+
+class NewsConsumer:
+    """
+    Discord-facing side of a producer / consumer deployment: posts the
+    stories a producer publishes to the channels subscribed to each feed.
+    It never scans, scrapes or summarizes, so it needs no Chrome, models
+    or caches.
+
+    With sharding (shard_count), each consumer only posts to channels in
+    its own shard's guilds, so several can share a subscription list.
+    """
+
+    def __init__(
+        self,
+        subscriptions: dict = SUBSCRIPTIONS,
+        host: str = BROKER_HOST,
+        port: int = BROKER_PORT,
+    ) -> None:
+        """
+        Args:
+            subscriptions (dict, optional): Feed -> channel ids to post it to
+            host (str, optional): Producer's host
+            port (int, optional): Producer's port
+        """
+        self.subscriptions = subscriptions
+        self.broker = BrokerClient(host, port, feeds=list(subscriptions))
+        self.poster = NewsPoster(client)
+        # (channel, feed, scan) -> posted messages, so edits of a scan
+        # (and scans resent after a reconnect) edit them in place
+        self._posted = OrderedDict()
+        self._task = None
+        return
+
+    def start(self) -> None:
+        """
+        Starts posting what the producer publishes. Safe to call again
+        (on_ready fires on every reconnect).
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return
+
+    async def _run(self) -> None:
+        async for message in self.broker.messages():
+            channels = self.subscriptions.get(message["feed"], [])
+            if SHARD_COUNT:
+                # Channels in other shards' guilds aren't in our cache
+                channels = [c for c in channels if client.get_channel(c) is not None]
+            # Channels have their own rate limits, so post to them together
+            await asyncio.gather(*[self._post(c, message) for c in channels])
+
+    async def _post(self, channel_id: int, message: dict) -> None:
+        """
+        Posts (or edits) a published scan in a channel.
 
+        Args:
+            channel_id (int): Channel to post to
+            message (dict): Published scan
+        """
+        key = (channel_id, message["feed"], message["scan"])
+        messages = self._posted.get(key)
+        print("Posting: ", message["heading"], len(message["stories"]), "stories")
+        try:
+            messages = await self.poster.post(
+                channel_id, message["heading"], message["stories"], messages=messages
+            )
+        except Exception as e:
+            print("Err posting " + message["feed"] + " news to", channel_id, ": ", e)
+            return
+        self._posted[key] = messages
+        self._posted.move_to_end(key)
+        while len(self._posted) > CONSUMER_POSTED_SCANS:
+            self._posted.popitem(last=False)
+        print("Posted update to " + message["feed"] + " news in", channel_id)
+        return
 
-# @client.event
-# async def on_disconnect():
-#     print("Shutting down!")
-#     bot.driver.quit()
-#     await client.close()
+    async def close(self) -> None:
+        """
+        Stops posting.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        return
 
 
-# @scan_us_news.before_loop
-# @scan_world_news.before_loop
 async def before() -> None:
     """
     Logic for before Discord bot is initialized.
@@ -526,15 +1040,259 @@ async def on_ready() -> None:
         datetime.now().strftime("%Y-%m-%d %I:%M:%S:%f %p")
         + " \nDiscord News Bot is ONLINE, listening for actions and scanning..\n"
     )
-    # client.start(bot.scan_us_news_loop())
-    # client.start(bot.scan_world_news_loop())
-    client.loop.create_task(bot.scan_us_news_loop())
-    client.loop.create_task(bot.scan_world_news_loop())
+    if consumer is not None:
+        consumer.start()
+        return
+    # Models are loaded lazily; load them in the background now that
+    # we're connected
+    bot.warm_up()
+    bot.start_scanning()
+
+
+async def main() -> None:
+    """
+    Runs the Discord client, and cleans up the bot once it stops.
+    """
+    try:
+        if bot.metrics_server is not None:
+            await bot.metrics_server.start()
+        async with client:
+            await client.start(TOKEN)
+    finally:
+        await bot.close()
+
+
+async def run_producer() -> None:
+    """
+    Runs the bot as a producer: scans every feed and publishes the
+    stories to consumers, without connecting to Discord.
+    """
+    try:
+        await bot.broker.start()
+        if bot.metrics_server is not None:
+            await bot.metrics_server.start()
+        bot.warm_up()
+        bot.start_scanning()
+        # Until interrupted
+        await asyncio.Event().wait()
+    finally:
+        await bot.close()
+
+
+async def run_consumer() -> None:
+    """
+    Runs the bot as a consumer: connects to Discord and posts what the
+    producer publishes.
+    """
+    try:
+        async with client:
+            await client.start(TOKEN)
+    finally:
+        await consumer.close()
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """
+    Parses the command line.
+
+    Args:
+        argv (list, optional): Arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Discord news bot.")
+    parser.add_argument(
+        "--mode",
+        choices=("standalone", "producer", "consumer"),
+        default=MODE,
+        help="Scan and post (standalone), only scan and publish (producer), "
+        "or only post what a producer publishes (consumer)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Run scan cycles without connecting to Discord, printing the posts",
+    )
+    dry_run = parser.add_argument_group("dry run")
+    dry_run.add_argument(
+        "--cycles", type=int, default=1, help="Scan cycles to run (default 1)"
+    )
+    dry_run.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="Seconds from one cycle's start to the next's (default 0)",
+    )
+    dry_run.add_argument(
+        "--rescan",
+        action="store_true",
+        help="Forget the pages and stories seen before each cycle, so every "
+        "cycle scans every story (articles and summaries stay cached)",
+    )
+    dry_run.add_argument(
+        "--feed",
+        action="append",
+        help="Only scan this feed (repeat for more; default every feed)",
+    )
+    dry_run.add_argument(
+        "--replay", metavar="DIR", help="Read feed pages from DIR/<feed name>.html"
+    )
+    dry_run.add_argument("--limit", type=int, help="Headlines per feed")
+    dry_run.add_argument("--concurrency", type=int, help="Max articles scraped at once")
+    dry_run.add_argument("--scans", type=int, help="Max feeds scanned at once")
+    dry_run.add_argument("--backend", help="Summarizer backend")
+    dry_run.add_argument(
+        "--workers", type=int, help="Summarizer worker processes (0 for none)"
+    )
+    dry_run.add_argument(
+        "--data-dir",
+        help="Cache / story index directory (default a fresh temporary one)",
+    )
+    dry_run.add_argument(
+        "--json",
+        action="store_true",
+        help="Print a JSON report on stdout instead of the posts (logs go to stderr)",
+    )
+    dry_run.add_argument("--output", help="Also write the JSON report here")
+    args = parser.parse_args(argv)
+    for name in args.feed or []:
+        if name not in [feed.name for feed in FEEDS]:
+            parser.error("unknown feed: " + name)
+    if args.dry_run:
+        return args
+    if args.mode == "standalone":
+        missing = [feed.name for feed in FEEDS if feed.channel_id is None]
+        if missing:
+            parser.error("feeds without a channel_id: " + ", ".join(missing))
+    elif args.mode == "consumer" and not SUBSCRIPTIONS:
+        parser.error("a consumer needs subscriptions, or feeds with a channel_id")
+    return args
+
+
+async def run_dry(args: argparse.Namespace) -> dict:
+    """
+    Runs scan cycles through the whole pipeline, with posts recorded
+    instead of sent to Discord.
+
+    Args:
+        args (argparse.Namespace): Parsed command line
+
+    Returns:
+        dict: Report of the run (settings, cycles, posts and stage timings)
+    """
+    max_articles_in_flight = args.concurrency or MAX_ARTICLES_IN_FLIGHT
+    max_concurrent_scans = args.scans or MAX_CONCURRENT_SCANS
+    backend = args.backend or SUMMARIZER_BACKEND
+    summary_workers = SUMMARY_WORKERS if args.workers is None else args.workers
+    # Copies, so the flags don't change the configured feeds
+    feeds = [copy.copy(feed) for feed in FEEDS]
+    if args.feed:
+        feeds = [feed for feed in feeds if feed.name in args.feed]
+    if args.limit:
+        for feed in feeds:
+            feed.limit = args.limit
+    # Keep the bot's real caches / story index out of it, unless asked
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="news-dry-run-")
+    summarizer.configure(
+        backend=backend,
+        long_article_words=LONG_ARTICLE_WORDS,
+        latency_budget=SUMMARY_LATENCY_BUDGET,
+        long_article_backend=LONG_ARTICLE_BACKEND,
+        bart_inference=BART_INFERENCE,
+        memo_size=SUMMARY_MEMO_SIZE,
+        memo_path=os.path.join(data_dir, "summary_memo.sqlite"),
+        memo_ttl=SUMMARY_MEMO_TTL,
+        memo_max_entries=SUMMARY_MEMO_MAX_ENTRIES,
+    )
+    dry_bot = NewsBot(
+        data_dir=data_dir,
+        feeds=feeds,
+        max_articles_in_flight=max_articles_in_flight,
+        max_concurrent_scans=max_concurrent_scans,
+        summary_workers=summary_workers,
+    )
+    dry_bot.poster = DryRunPoster(stream=None if args.json else sys.stdout)
+    if args.replay:
+        dry_bot.fetcher = ReplayFetcher(
+            dry_bot.fetcher, load_replay(args.replay, feeds)
+        )
+    try:
+        cycles = await run_cycles(
+            dry_bot,
+            feeds,
+            cycles=args.cycles,
+            interval=args.interval,
+            max_concurrent_scans=max_concurrent_scans,
+            rescan=args.rescan,
+        )
+    finally:
+        await dry_bot.close()
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return {
+        "settings": {
+            "feeds": [feed.name for feed in feeds],
+            "cycles": args.cycles,
+            "rescan": args.rescan,
+            "replay": args.replay,
+            "limit": args.limit,
+            "max_articles_in_flight": max_articles_in_flight,
+            "max_concurrent_scans": max_concurrent_scans,
+            "summarizer_backend": backend,
+            "summary_workers": summary_workers,
+        },
+        "cycles": cycles,
+        "posts": dry_bot.poster.posts,
+        "stages": dry_bot.metrics.totals(),
+    }
+
+
+def dry_run(args: argparse.Namespace) -> None:
+    """
+    Runs a dry run and outputs its report.
+
+    Args:
+        args (argparse.Namespace): Parsed command line
+    """
+    if args.json:
+        # Keep stdout for the report
+        sys.stdout, stdout = sys.stderr, sys.stdout
+        try:
+            report = asyncio.run(run_dry(args))
+        finally:
+            sys.stdout = stdout
+        print(json.dumps(report, indent=2))
+    else:
+        report = asyncio.run(run_dry(args))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return
 
 
 """
 Initialize bot.
 """
 if __name__ == "__main__":
-    bot = NewsBot()
-    client.run(TOKEN)
+    args = parse_args()
+    if args.dry_run:
+        dry_run(args)
+    elif args.mode == "producer":
+        bot = NewsBot(
+            broker=BrokerServer(
+                BROKER_HOST,
+                BROKER_PORT,
+                queue_size=BROKER_QUEUE_SIZE,
+                history=BROKER_HISTORY,
+            )
+        )
+        asyncio.run(run_producer())
+    elif args.mode == "consumer":
+        consumer = NewsConsumer()
+        discord.utils.setup_logging()
+        asyncio.run(run_consumer())
+    else:
+        bot = NewsBot()
+        discord.utils.setup_logging()
+        asyncio.run(main())
@@ -0,0 +1,44 @@
+# Shared fixtures: running code against discord_news in a fresh process.
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FEEDS = [
+    {"name": "us", "url": "http://127.0.0.1/feed/us", "channel_id": ""},
+    {"name": "world", "url": "http://127.0.0.1/feed/world", "channel_id": ""},
+]
+
+
+@pytest.fixture
+def run_bot(tmp_path):
+    """
+    Runs Python code in a fresh process, next to a config.json whose
+    feeds have no channel_id, so discord_news can be imported.
+
+    discord_news reads its config and sets up goose, the executors and
+    the summarizer at import time, so each run gets its own process.
+    """
+
+    def run(code: str, argv: list = None) -> subprocess.CompletedProcess:
+        config = {"token": "", "feeds": FEEDS, "metrics_port": None}
+        (tmp_path / "config.json").write_text(json.dumps(config))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            [ROOT] + [p for p in [env.get("PYTHONPATH")] if p]
+        )
+        return subprocess.run(
+            [sys.executable, "-c", code] + (argv or []),
+            cwd=tmp_path,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=300,
+        )
+
+    return run
@@ -0,0 +1,27 @@
+# Command line parsing against configs without feed channels.
+
+import json
+
+PARSE = (
+    "import json, sys, discord_news\n"
+    "args = discord_news.parse_args(sys.argv[1:])\n"
+    "print(json.dumps(vars(args)))\n"
+)
+
+
+def test_dry_run_without_channels(run_bot):
+    run = run_bot(PARSE, ["--dry-run", "--cycles", "2", "--feed", "us"])
+    assert run.returncode == 0, run.stderr
+    args = json.loads(run.stdout.strip().splitlines()[-1])
+    assert args["dry_run"] and args["cycles"] == 2 and args["feed"] == ["us"]
+
+
+def test_producer_without_channels(run_bot):
+    run = run_bot(PARSE, ["--mode", "producer"])
+    assert run.returncode == 0, run.stderr
+
+
+def test_standalone_needs_channels(run_bot):
+    run = run_bot(PARSE, ["--mode", "standalone"])
+    assert run.returncode != 0
+    assert "feeds without a channel_id: us, world" in run.stderr
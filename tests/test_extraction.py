@@ -0,0 +1,32 @@
+# Article extraction with goose, from several threads at once.
+
+import json
+
+# Every thread starts extracting at the same moment, on a cold goose
+# (its first extractions are the ones that raced), then the same pages
+# are extracted one at a time.
+EXTRACT = """
+import json, threading
+from concurrent.futures import ThreadPoolExecutor
+import benchmark, discord_news
+
+pages = [benchmark.make_article_html("doc-" + str(i), 600) for i in range(8)]
+barrier = threading.Barrier(len(pages))
+
+def extract(html):
+    barrier.wait()
+    return discord_news.NewsBot._extract_text(None, html)
+
+with ThreadPoolExecutor(max_workers=len(pages)) as executor:
+    concurrent = list(executor.map(extract, pages))
+serial = [discord_news.NewsBot._extract_text(None, html) for html in pages]
+print(json.dumps({"concurrent": concurrent, "serial": serial}))
+"""
+
+
+def test_concurrent_extraction_matches_serial(run_bot):
+    run = run_bot(EXTRACT)
+    assert run.returncode == 0, run.stderr
+    texts = json.loads(run.stdout.strip().splitlines()[-1])
+    assert all(texts["serial"])
+    assert texts["concurrent"] == texts["serial"]